@@ -6,11 +6,21 @@ __authors__ = [
     "ZhengYu, Xu <zen-xu@outlook.com>",
 ]
 
+from ._internal.api import attach_to_process as attach_to_process
 from ._internal.api import connect_to_debugger as connect_to_debugger
+from ._internal.api import install_signal_handler as install_signal_handler
+from ._internal.api import (
+    install_signal_handler_from_env as _install_signal_handler_from_env,
+)
 from ._internal.api import launch_pland_on_exception as launch_pland_on_exception
 from ._internal.api import post_mortem as post_mortem
+from ._internal.api import run_debugger_commands as run_debugger_commands
 from ._internal.api import set_trace as set_trace
+from ._internal.rpc import RpcClient as RpcClient
+from ._internal.rpc import RpcError as RpcError
 
 
 # lpe is an alias for launch_pland_on_exception
 lpe = launch_pland_on_exception
+
+_install_signal_handler_from_env()
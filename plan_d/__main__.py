@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 import click
 
-from . import __version__, connect_to_debugger
+from . import __version__, connect_to_debugger, run_debugger_commands
+from ._internal.api import DEFAULT_ATTACH_IP, inject_set_trace, parse_signal
+
+
+if TYPE_CHECKING:
+    from typing import BinaryIO, Callable, TextIO
 
 
 @click.version_option(__version__, "-v", "--version")
@@ -10,25 +17,139 @@ from . import __version__, connect_to_debugger
 def cli(): ...
 
 
+def session_options(command: Callable) -> Callable:
+    """
+    The options of the commands connecting a debugger session.
+    """
+    options = [
+        click.option(
+            "-t",
+            "--timeout",
+            type=float,
+            default=10,
+            show_default=True,
+            help="Connection timeout in seconds",
+        ),
+        click.option(
+            "--client-render",
+            is_flag=True,
+            help="Render rich outputs locally instead of on the remote server",
+        ),
+        click.option(
+            "-s",
+            "--script",
+            type=click.File("r"),
+            help="Run the debugger commands of FILE without a terminal, then detach",
+        ),
+        click.option(
+            "-e",
+            "--exec",
+            "exec_cmds",
+            multiple=True,
+            metavar="CMD",
+            help="Run a debugger command without a terminal, then detach (repeatable)",
+        ),
+        click.option(
+            "-o",
+            "--output",
+            type=click.File("wb"),
+            help="Write the output of --script/--exec to FILE",
+        ),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def run_session(
+    ip: str,
+    port: int,
+    timeout: float,
+    client_render: bool,
+    script: TextIO | None,
+    exec_cmds: tuple[str, ...],
+    output: BinaryIO | None,
+) -> None:
+    try:
+        if script or exec_cmds:
+            commands = [*(script.read().splitlines() if script else []), *exec_cmds]
+            run_debugger_commands(
+                ip,
+                port,
+                commands,
+                timeout=timeout,
+                output=output,
+            )
+            return
+        connect_to_debugger(ip, port, timeout=timeout, client_render=client_render)
+    except (ConnectionRefusedError, TimeoutError):
+        raise click.ClickException("Connection refused - did you use the right port?")  # noqa: B904
+
+
 @cli.command
 @click.argument("ip")
 @click.argument("port", type=int)
+@session_options
+def debug(
+    ip: str,
+    port: int,
+    timeout: float,
+    client_render: bool,
+    script: TextIO | None,
+    exec_cmds: tuple[str, ...],
+    output: BinaryIO | None,
+) -> None:
+    """
+    Connect the debugger to a remote server.
+    """
+    run_session(ip, port, timeout, client_render, script, exec_cmds, output)
+
+
+@cli.command
+@click.argument("pid", type=int)
 @click.option(
-    "-t",
-    "--timeout",
-    type=float,
-    default=10,
+    "-p",
+    "--port",
+    type=int,
+    default=0,
+    help="Port of the debugger listener  [default: a free port]",
+)
+@click.option(
+    "--signal",
+    "signal_name",
+    default="SIGUSR2",
     show_default=True,
-    help="Connection timeout in seconds",
+    help="Signal used to pause the process, its handler is replaced",
 )
-def debug(ip: str, port: int, timeout: float) -> None:
+@session_options
+def attach(
+    pid: int,
+    port: int,
+    signal_name: str,
+    timeout: float,
+    client_render: bool,
+    script: TextIO | None,
+    exec_cmds: tuple[str, ...],
+    output: BinaryIO | None,
+) -> None:
     """
-    Connect the debugger to a remote server.
+    Inject the debugger into a running Python process of this host and connect.
     """
     try:
-        connect_to_debugger(ip, port, timeout=timeout)
-    except (ConnectionRefusedError, TimeoutError):
-        raise click.ClickException("Connection refused - did you use the right port?")  # noqa: B904
+        signum = parse_signal(signal_name)
+    except (KeyError, ValueError):
+        raise click.BadParameter(
+            f"unknown signal {signal_name!r}", param_hint="--signal"
+        ) from None
+    try:
+        port = inject_set_trace(pid, port=port, signum=signum)
+    except ProcessLookupError:
+        raise click.ClickException(f"No process with pid {pid}") from None
+    except (PermissionError, RuntimeError) as e:
+        raise click.ClickException(str(e)) from e
+    run_session(
+        DEFAULT_ATTACH_IP, port, timeout, client_render, script, exec_cmds, output
+    )
 
 
 if __name__ == "__main__":
@@ -4,12 +4,14 @@ import os
 import signal
 import socket
 import sys
+import tempfile
+import threading
 
 from contextlib import suppress
 from inspect import currentframe
 from pdb import Pdb
 from termios import tcdrain
-from typing import TYPE_CHECKING, Callable, Generator, TypeVar, cast
+from typing import TYPE_CHECKING, Any, Callable, Generator, Iterable, TypeVar, cast
 
 from decorator import contextmanager
 from IPython.core.debugger import Pdb as IPdb
@@ -18,24 +20,34 @@ from madbg.communication import Piping, send_message
 from madbg.utils import use_context
 from typing_extensions import Concatenate, ParamSpec
 
-from . import utils
+from . import recorder, utils
 from .debugger import RemoteDebugger
+from .remote_render import ClientPiping
 
 
 if TYPE_CHECKING:
     from types import FrameType, TracebackType
+    from typing import BinaryIO
 
     from rich.console import Console
 
 
 ENV_VAR_IP = "PLAND_IP"
 ENV_VAR_PORT = "PLAND_PORT"
+ENV_VAR_SIGNAL = "PLAND_SIGNAL"
+ENV_VAR_SIGNAL_THREAD = "PLAND_SIGNAL_THREAD"
 
 DEFAULT_IP = socket.gethostbyname(socket.gethostname())
 DEFAULT_PORT = 3513
 DEFAULT_PROMPT = "plan-d> "
+DEFAULT_ATTACH_IP = "127.0.0.1"
 
 BAN_CMDS = {"list"}
+RESUME_CMDS = {"c", "cont", "continue"}
+END_CMDS = {"q", "quit", "exit", "detach"}
+
+# rows and columns of the outputs of headless sessions
+SCRIPT_TERM_SIZE = (50, 120)
 
 
 def set_trace(
@@ -48,9 +60,19 @@ def set_trace(
     console: Console | None = None,
     syntax_theme: str | None = None,
     disable_magic_cmd: bool | None = None,
+    pager: bool | None = None,
+    commands: Iterable[str] | None = None,
+    completion_timeout: float | None = None,
+    use_jedi: bool | None = None,
+    evaluation_timeout: float | None = None,
+    result_budget: int | None = None,
+    record: bool | int = False,
 ) -> None:
     frame = frame or currentframe().f_back  # type: ignore[union-attr]
     assert frame
+    if record is not True and record is not False and record < 1:
+        # before waiting for a client
+        raise ValueError(f"The capacity of a recording must be positive: {record}")
 
     ip = ip or str(os.getenv(ENV_VAR_IP, DEFAULT_IP))
     if port is None:
@@ -65,8 +87,22 @@ def set_trace(
         )
     )
     debugger = _config_debugger(
-        debugger, prompt, console, syntax_theme, disable_magic_cmd
+        debugger,
+        prompt,
+        console,
+        syntax_theme,
+        disable_magic_cmd,
+        pager,
+        commands,
+        completion_timeout,
+        use_jedi,
+        evaluation_timeout,
+        result_budget,
     )
+    if record and isinstance(debugger, RemoteDebugger):
+        debugger.start_recording(
+            frame, recorder.DEFAULT_CAPACITY if record is True else record
+        )
     debugger.set_trace(frame, done_callback=exit_stack.close)
 
 
@@ -80,6 +116,12 @@ def post_mortem(
     console: Console | None = None,
     syntax_theme: str | None = None,
     disable_magic_cmd: bool | None = None,
+    pager: bool | None = None,
+    commands: Iterable[str] | None = None,
+    completion_timeout: float | None = None,
+    use_jedi: bool | None = None,
+    evaluation_timeout: float | None = None,
+    result_budget: int | None = None,
     exception_max_frames: int = 100,
 ) -> None:
     traceback = traceback or sys.exc_info()[2] or sys.last_traceback
@@ -95,18 +137,226 @@ def post_mortem(
     ) as debugger:
         debugger = cast(RemoteDebugger, debugger)
         debugger = _config_debugger(
-            debugger, prompt, console, syntax_theme, disable_magic_cmd
+            debugger,
+            prompt,
+            console,
+            syntax_theme,
+            disable_magic_cmd,
+            pager,
+            commands,
+            completion_timeout,
+            use_jedi,
+            evaluation_timeout,
+            result_budget,
         )
         debugger.exception_max_frames = exception_max_frames
         debugger.post_mortem(traceback)
 
 
+def install_signal_handler(
+    signum: int = signal.SIGUSR2,
+    ip: str | None = None,
+    port: int | None = None,
+    thread: str | None = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Pause into the debugger when the process receives a signal.
+
+    The main thread, or the thread named `thread`, is paused at its current frame
+    and a listener is opened as with `set_trace`, which receives the other
+    arguments. Nothing runs before the signal arrives: no tracing and no thread.
+    It has to be called from the main thread.
+
+    Pausing another thread than the main one needs Python 3.12+: the signal
+    handler traces all the threads until the named one runs Python code.
+    """
+    if thread is not None and not hasattr(threading, "settrace_all_threads"):
+        raise RuntimeError("Pausing a named thread requires Python 3.12+")
+
+    def handler(signum: int, frame: FrameType | None) -> None:
+        if RemoteDebugger._get_current_instance() is not None:
+            # already debugging
+            return
+        if thread is None:
+            set_trace(frame, ip, port, **kwargs)
+        else:
+            _pause_thread(thread, ip, port, **kwargs)
+
+    signal.signal(signum, handler)
+
+
+def install_signal_handler_from_env() -> None:
+    """
+    Install the signal handler if `PLAND_SIGNAL` is set, to a signal name or number.
+    """
+    value = os.getenv(ENV_VAR_SIGNAL, "").strip()
+    if not value:
+        return
+    # a typo in the environment must not break the import of the application
+    try:
+        signum = parse_signal(value)
+    except (KeyError, ValueError):
+        _ignore_signal_env(f"{value!r} is not a signal")
+        return
+    try:
+        install_signal_handler(signum, thread=os.getenv(ENV_VAR_SIGNAL_THREAD) or None)
+    except RuntimeError as e:
+        _ignore_signal_env(str(e))
+    except ValueError:
+        # signal handlers can only be installed from the main thread
+        _ignore_signal_env("plan_d is not imported by the main thread")
+    except OSError:
+        _ignore_signal_env(f"{signum.name} can't be handled")
+
+
+def parse_signal(value: str) -> signal.Signals:
+    """
+    Parse a signal number or name, with or without the SIG prefix.
+    """
+    value = value.strip().upper()
+    if value.isdigit():
+        return signal.Signals(int(value))
+    return signal.Signals[value if value.startswith("SIG") else f"SIG{value}"]
+
+
+def inject_set_trace(
+    pid: int,
+    ip: str = DEFAULT_ATTACH_IP,
+    port: int = 0,
+    signum: int = signal.SIGUSR2,
+) -> int:
+    """
+    Open a debugger listener in another Python process of the same host.
+
+    The signal handler of `install_signal_handler` is injected into the process,
+    which is then signaled to pause its main thread. Processes running Python 3.14+
+    are injected with `sys.remote_exec`, the others with ptrace, which may need
+    privileges. Return the port of the listener, a free one if `port` is 0.
+    """
+    # raises ProcessLookupError early if there is no such process
+    os.kill(pid, 0)
+    if not _is_python_process(pid):
+        # the injection would crash it
+        raise RuntimeError(f"Process {pid} is not running Python")
+    if not port:
+        port = _get_free_port(ip)
+    # the process may not have plan_d in its path, fall back on this one
+    package_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    code = (
+        "import os, sys\n"
+        "try:\n"
+        "    import plan_d\n"
+        "except ImportError:\n"
+        f"    sys.path.append({os.path.abspath(package_path)!r})\n"
+        "    import plan_d\n"
+        f"plan_d.install_signal_handler({int(signum)}, ip={ip!r}, port={port})\n"
+    )
+    if _remote_exec(pid, f"{code}os.kill(os.getpid(), {int(signum)})\n"):
+        return port
+
+    from hypno import inject_py
+
+    try:
+        inject_py(pid, code)
+    except Exception as e:
+        raise RuntimeError(
+            f"Could not inject the debugger into process {pid}: {e}"
+        ) from e
+    # signaled from here: the injected code runs while the process is traced
+    os.kill(pid, signum)
+    return port
+
+
+def attach_to_process(
+    pid: int,
+    port: int = 0,
+    signum: int = signal.SIGUSR2,
+    timeout: float = madbg_client.DEFAULT_CONNECT_TIMEOUT,
+    client_render: bool = False,
+) -> None:
+    """
+    Inject the debugger into a running Python process and connect to it.
+    """
+    port = inject_set_trace(pid, port=port, signum=signum)
+    connect_to_debugger(
+        DEFAULT_ATTACH_IP, port, timeout=timeout, client_render=client_render
+    )
+
+
+def _remote_exec(pid: int, code: str) -> bool:
+    """
+    Run code in a process with `sys.remote_exec`, return whether it was possible.
+    """
+    remote_exec = getattr(sys, "remote_exec", None)
+    if remote_exec is None:
+        return False
+    # the script runs later in the process, it removes itself
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as script:
+        script.write(f"import os\nos.remove({script.name!r})\n{code}")
+    os.chmod(script.name, 0o644)
+    try:
+        remote_exec(pid, script.name)
+    except (OSError, RuntimeError):
+        # the process runs another Python version or disabled remote debugging
+        os.remove(script.name)
+        return False
+    return True
+
+
+def _is_python_process(pid: int) -> bool:
+    """
+    Whether the executable or a library mapped by a process is Python's.
+    """
+    try:
+        with open(f"/proc/{pid}/maps") as maps:
+            return any("python" in line.rpartition("/")[2] for line in maps)
+    except FileNotFoundError:
+        # no procfs, let the injection tell
+        return True
+
+
+def _ignore_signal_env(reason: str) -> None:
+    print(f"plan-d: {ENV_VAR_SIGNAL} is ignored: {reason}", file=sys.stderr)
+
+
+def _get_free_port(ip: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((ip, 0))
+        return sock.getsockname()[1]
+
+
+def _pause_thread(name: str, ip: str | None, port: int | None, **kwargs: Any) -> None:
+    target = next((t for t in threading.enumerate() if t.name == name), None)
+    frame = sys._current_frames().get(target.ident) if target else None  # type: ignore[arg-type]
+    if target is None or frame is None:
+        print(f"plan-d: no thread named {name!r}", file=sys.stderr)
+        return
+
+    def trace(frame: FrameType, event: str, arg: Any):
+        if threading.current_thread() is not target:
+            return None
+        threading.settrace_all_threads(None)  # type: ignore[attr-defined]
+        set_trace(frame, ip, port, **kwargs)
+        return sys.gettrace()
+
+    threading.settrace_all_threads(trace)  # type: ignore[attr-defined]
+    # the target gets line events in the frame it is running
+    frame.f_trace = trace
+
+
 def _config_debugger(
     debugger: RemoteDebugger,
     prompt: str | None = None,
     console: Console | None = None,
     syntax_theme: str | None = None,
     disable_magic_cmd: bool | None = None,
+    pager: bool | None = None,
+    commands: Iterable[str] | None = None,
+    completion_timeout: float | None = None,
+    use_jedi: bool | None = None,
+    evaluation_timeout: float | None = None,
+    result_budget: int | None = None,
 ) -> RemoteDebugger:
     prompt = prompt or DEFAULT_PROMPT
     if not prompt.endswith(" "):
@@ -122,6 +372,17 @@ def _config_debugger(
     if disable_magic_cmd is not None:
         debugger.disable_magic_cmd = disable_magic_cmd
 
+    if pager is not None:
+        debugger.pager = pager
+
+    if isinstance(debugger, RemoteDebugger):
+        if commands:
+            debugger.queue_commands(commands)
+        debugger.config_completion(timeout=completion_timeout, use_jedi=use_jedi)
+        debugger.config_evaluation(
+            timeout=evaluation_timeout, result_budget=result_budget
+        )
+
     for ban_cmd in BAN_CMDS:
         with suppress(AttributeError):
             delattr(Pdb, f"do_{ban_cmd}")
@@ -138,6 +399,7 @@ def connect_to_debugger(
     timeout=madbg_client.DEFAULT_CONNECT_TIMEOUT,
     in_fd=madbg_client.STDIN_FILENO,
     out_fd=madbg_client.STDOUT_FILENO,
+    client_render: bool = False,
 ) -> None:
     with madbg_client.connect_to_server(ip, port, timeout) as socket:
         tty_handle = madbg_client.get_tty_handle()
@@ -147,6 +409,7 @@ def connect_to_debugger(
             # prompt toolkit will receive this string, and it can be 'unknown'
             "term_type": os.environ.get("TERM", "unknown"),
             "term_size": (term_size.lines, term_size.columns),
+            "client_render": client_render,
         }
         send_message(socket, term_data)
 
@@ -157,10 +420,51 @@ def connect_to_debugger(
 
         with madbg_client.prepare_terminal():
             socket_fd = socket.fileno()
-            Piping({in_fd: {socket_fd}, socket_fd: {out_fd}}).run()
+            pipe_dict = {in_fd: {socket_fd}, socket_fd: {out_fd}}
+            if client_render:
+                ClientPiping(pipe_dict, socket_fd, in_fd).run()
+            else:
+                Piping(pipe_dict).run()
             tcdrain(out_fd)
 
 
+def run_debugger_commands(
+    ip: str,
+    port: int,
+    commands: Iterable[str],
+    timeout: float = madbg_client.DEFAULT_CONNECT_TIMEOUT,
+    output: BinaryIO | None = None,
+) -> None:
+    """
+    Run debugger commands on a remote server without a terminal.
+
+    All the commands are sent at once and run on the server side, the session is
+    detached after the last one, letting the program continue.
+    """
+    lines = [line.strip() for line in commands]
+    lines = [line for line in lines if line and not line.startswith("#")]
+    last_cmd = lines[-1].split()[0] if lines else ""
+    if last_cmd in RESUME_CMDS:
+        lines[-1] = "detach"
+    elif last_cmd not in END_CMDS:
+        lines.append("detach")
+
+    with madbg_client.connect_to_server(ip, port, timeout) as socket:
+        term_data = {
+            "term_attrs": None,
+            "term_type": "dumb",
+            "term_size": SCRIPT_TERM_SIZE,
+            "headless": True,
+            "commands": lines,
+        }
+        send_message(socket, term_data)
+        socket.settimeout(None)
+        output = output or sys.stdout.buffer
+        while data := socket.recv(4096):
+            output.write(data)
+            output.flush()
+
+
 _P = ParamSpec("_P")
 _T = TypeVar("_T")
 
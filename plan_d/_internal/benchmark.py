@@ -0,0 +1,188 @@
+"""
+Benchmarks of statements against the data of a paused frame.
+
+Like `timeit`, a statement is run in a loop compiled around it, with the garbage
+collector disabled, and the number of loops is calibrated so that a run takes a
+few milliseconds. Unlike `timeit`, all the runs are kept to report the percentiles
+of the distribution, not only its best run.
+"""
+
+from __future__ import annotations
+
+import gc
+import io
+import itertools
+import statistics
+import sys
+import time
+import tokenize
+import tracemalloc
+
+from typing import Any, Callable, NamedTuple
+
+
+DEFAULT_BENCH_DURATION = 1.0
+# the calibrated duration of a run, the shorter the more runs in the distribution
+RUN_TARGET = 0.005
+MIN_RUNS = 5
+
+TEMPLATE = """
+def bench(_loops, _timer):
+    _started = _timer()
+    for _ in _loops:
+        {statement}
+    return _timer() - _started
+"""
+
+
+class BenchResult(NamedTuple):
+    statement: str
+    loops: int
+    # the time of a loop, in each run
+    times: list[float]
+    # the peak of the memory allocated by a loop, None if it can't be traced
+    peak_memory: int | None
+    # the memory blocks a loop leaves allocated, on average: not its allocations,
+    # which Python doesn't count, but the ones it keeps, as a leak does
+    retained_blocks: float
+    # whether the allocations were traced during the runs, slowing them down
+    traced: bool
+
+    @property
+    def min(self) -> float:
+        return min(self.times)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def p95(self) -> float:
+        return _percentile(self.times, 95)
+
+    @property
+    def p99(self) -> float:
+        return _percentile(self.times, 99)
+
+
+def split_statements(arg: str) -> list[str]:
+    """
+    Split statements on the `|` which are not between brackets.
+    """
+    statements = []
+    depth = start = 0
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(arg).readline):
+            if token.type != tokenize.OP:
+                continue
+            if token.string in "([{":
+                depth += 1
+            elif token.string in ")]}":
+                depth -= 1
+            elif token.string == "|" and depth == 0:
+                statements.append(arg[start : token.start[1]])
+                start = token.end[1]
+    except tokenize.TokenError:
+        # unbalanced brackets, reported when compiled
+        pass
+    statements.append(arg[start:])
+    return [statement.strip() for statement in statements if statement.strip()]
+
+
+def bench_statement(
+    statement: str,
+    namespace: dict[str, Any],
+    duration: float = DEFAULT_BENCH_DURATION,
+) -> BenchResult:
+    """
+    Time a statement run with the globals `namespace`.
+
+    The statement is warmed up by the calibration of its number of loops, then
+    run for `duration` seconds, and at least `MIN_RUNS` times.
+    """
+    # a syntax error is reported against the statement, not the template
+    code = compile(statement, "<bench>", "exec")
+    bench = _make_bench(statement, namespace)
+    peak_memory = _peak_memory(code, namespace)
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loops = _calibrate(bench)
+        times: list[float] = []
+        blocks = sys.getallocatedblocks()
+        deadline = time.perf_counter() + duration
+        while len(times) < MIN_RUNS or time.perf_counter() < deadline:
+            elapsed = bench(itertools.repeat(None, loops), time.perf_counter)
+            times.append(elapsed / loops)
+        retained_blocks = (sys.getallocatedblocks() - blocks) / (loops * len(times))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return BenchResult(
+        statement,
+        loops,
+        times,
+        peak_memory,
+        retained_blocks,
+        tracemalloc.is_tracing(),
+    )
+
+
+def format_duration(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def _make_bench(
+    statement: str, namespace: dict[str, Any]
+) -> Callable[[Any, Callable[[], float]], float]:
+    scope: dict[str, Any] = {}
+    exec(
+        compile(TEMPLATE.format(statement=statement), "<bench>", "exec"),
+        namespace,
+        scope,
+    )
+    return scope["bench"]
+
+
+def _calibrate(bench: Callable[[Any, Callable[[], float]], float]) -> int:
+    """
+    The number of loops of a run of about `RUN_TARGET` seconds.
+    """
+    loops = 1
+    while True:
+        elapsed = bench(itertools.repeat(None, loops), time.perf_counter)
+        if elapsed >= RUN_TARGET:
+            return loops
+        # aim at the target, without jumping more than 10 times
+        loops = min(int(loops * RUN_TARGET / max(elapsed, 1e-9)) + 1, loops * 10)
+
+
+def _peak_memory(code: Any, namespace: dict[str, Any]) -> int | None:
+    """
+    The peak of the memory allocated while running a code once.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        try:
+            exec(code, namespace)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    reset_peak = getattr(tracemalloc, "reset_peak", None)
+    if reset_peak is None:
+        # Python < 3.9 can't measure a peak while `mem start` traces
+        return None
+    current = tracemalloc.get_traced_memory()[0]
+    reset_peak()
+    exec(code, namespace)
+    return max(tracemalloc.get_traced_memory()[1] - current, 0)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
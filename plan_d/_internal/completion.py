@@ -0,0 +1,186 @@
+"""
+Tab completion for remote sessions.
+
+IPython's completer introspects the live frame (and runs jedi) on every key press,
+which freezes the prompt for frames with huge globals or objects with expensive
+`__getattr__` / `__dir__`. `FrameCompleter` asks IPython for completions with a
+time budget; when the budget runs out, it answers from a `CompletionIndex` of the
+frame, a sorted list of names and cached `dir()` results, built once per frame.
+"""
+
+from __future__ import annotations
+
+import builtins
+import keyword
+import re
+
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Any
+
+from prompt_toolkit.completion import Completer, Completion
+
+
+if TYPE_CHECKING:
+    from types import FrameType
+    from typing import Callable, Iterable, Iterator
+
+    from prompt_toolkit.completion import CompleteEvent
+    from prompt_toolkit.document import Document
+
+
+DEFAULT_COMPLETION_TIMEOUT = 0.5
+
+_DOTTED_NAME = re.compile(r"[A-Za-z_][\w.]*$|$")
+
+
+class CompletionIndex:
+    """
+    The names visible in a frame, with the `dir()` of the objects completed so far.
+    """
+
+    def __init__(
+        self,
+        frame: FrameType,
+        namespace: dict[str, Any],
+        commands: Iterable[str] = (),
+    ) -> None:
+        self.frame = frame
+        self.namespace = namespace
+        self.size = self.namespace_size()
+        self.names = sorted(
+            {*namespace, *frame.f_globals, *vars(builtins), *keyword.kwlist}
+        )
+        self.commands = sorted(commands)
+        # id -> (object, sorted dir), the object is kept so that the id is not reused
+        self.attributes: dict[int, tuple[Any, list[str]]] = {}
+        # IPython already ran out of time for this frame, don't wait for it again
+        self.slow = False
+
+    def namespace_size(self) -> int:
+        return len(self.namespace) + len(self.frame.f_globals)
+
+    def is_stale(self, frame: FrameType | None, namespace: dict[str, Any]) -> bool:
+        return (
+            frame is not self.frame
+            or namespace is not self.namespace
+            or self.namespace_size() != self.size
+        )
+
+    def complete(self, text: str, first_word: bool = False) -> tuple[str, list[str]]:
+        """
+        Complete the dotted name at the end of `text`.
+
+        Return the prefix being completed and the matching candidates.
+        """
+        token = _DOTTED_NAME.search(text).group()  # type: ignore[union-attr]
+        base, dot, prefix = token.rpartition(".")
+        if not dot:
+            candidates = self.names
+            if first_word and token == text.lstrip():
+                candidates = sorted({*self.commands, *candidates})
+            return prefix, _prefixed(candidates, prefix)
+
+        try:
+            obj = self.resolve(base)
+        except Exception:
+            return prefix, []
+        return prefix, _prefixed(self.dir(obj), prefix)
+
+    def resolve(self, dotted_name: str) -> Any:
+        name, *attrs = dotted_name.split(".")
+        for scope in (self.namespace, self.frame.f_globals, vars(builtins)):
+            if name in scope:
+                obj = scope[name]
+                break
+        else:
+            raise NameError(name)
+        for attr in attrs:
+            obj = getattr(obj, attr)
+        return obj
+
+    def dir(self, obj: Any) -> list[str]:
+        cached = self.attributes.get(id(obj))
+        if cached is not None and cached[0] is obj:
+            return cached[1]
+        try:
+            names = sorted(name for name in dir(obj) if isinstance(name, str))
+        except Exception:
+            names = []
+        self.attributes[id(obj)] = (obj, names)
+        return names
+
+
+class FrameCompleter(Completer):
+    """
+    Complete with IPython within a time budget, fall back to a `CompletionIndex`.
+    """
+
+    def __init__(
+        self,
+        ipython_completer: Completer,
+        get_namespace: Callable[[], tuple[FrameType | None, dict[str, Any]]],
+        commands: Iterable[str] = (),
+        timeout: float = DEFAULT_COMPLETION_TIMEOUT,
+    ) -> None:
+        self.ipython_completer = ipython_completer
+        self.get_namespace = get_namespace
+        self.commands = list(commands)
+        self.timeout = timeout
+        self.index: CompletionIndex | None = None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="plan-d-completion")
+        self.pending: Future | None = None
+
+    def get_completions(
+        self, document: Document, complete_event: CompleteEvent
+    ) -> Iterator[Completion]:
+        index = self.get_index()
+        if index is None:
+            yield from self.ipython_completer.get_completions(document, complete_event)
+            return
+
+        if self.timeout > 0 and not index.slow and not self.is_busy():
+            future = self.executor.submit(
+                list, self.ipython_completer.get_completions(document, complete_event)
+            )
+            try:
+                yield from future.result(timeout=self.timeout)
+                return
+            except FutureTimeoutError:
+                # let it finish in the background, without waiting for it again
+                index.slow = True
+                self.pending = future
+            except Exception:
+                # a broken completer is as good as a slow one
+                index.slow = True
+
+        text = document.text_before_cursor
+        prefix, candidates = index.complete(text, first_word="\n" not in text)
+        for candidate in candidates:
+            yield Completion(candidate, start_position=-len(prefix))
+
+    def get_index(self) -> CompletionIndex | None:
+        frame, namespace = self.get_namespace()
+        if frame is None:
+            return None
+        if self.index is None or self.index.is_stale(frame, namespace):
+            self.index = CompletionIndex(frame, namespace, self.commands)
+        return self.index
+
+    def is_busy(self) -> bool:
+        return self.pending is not None and not self.pending.done()
+
+
+def _prefixed(names: list[str], prefix: str) -> list[str]:
+    """
+    The names starting with `prefix`, `names` must be sorted.
+    """
+    matches = []
+    for name in names[bisect_left(names, prefix) :]:
+        if not name.startswith(prefix):
+            break
+        matches.append(name)
+    if not prefix.startswith("_"):
+        matches = [name for name in matches if not name.startswith("_")] or matches
+    return matches
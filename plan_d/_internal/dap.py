@@ -0,0 +1,328 @@
+"""
+A Debug Adapter Protocol endpoint, so that editors can attach to `set_trace`.
+
+Editors connect to the same port as `plan-d debug`, the session is recognized by
+its first bytes (``Content-Length``). The debugger is a `RpcDebugger` speaking DAP
+instead of JSON-RPC. Variables are resolved lazily: a `variablesReference` is only
+expanded when the editor asks for it, containers are paged with `start` and
+`count`, and the children of a request without a page are capped, so large frames
+are never fully serialized.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import socket
+import threading
+
+from itertools import islice
+from typing import TYPE_CHECKING, Any
+
+from .rpc import DEFAULT_MAX_ITEMS, JsonLineStream, RpcDebugger, RpcError, safe_repr
+
+
+if TYPE_CHECKING:
+    from typing import Iterable
+
+
+DAP_HEADER = b"Content-Length: "
+DAP_MAGIC = DAP_HEADER[:4]
+
+STOP_REASONS = {"call": "step", "return": "step"}
+
+MAX_VALUE_REPR = 1000
+# the children sent when the editor doesn't page them, such as named variables
+DEFAULT_PAGE_SIZE = DEFAULT_MAX_ITEMS
+
+# the containers reported as indexed, so that the editors page them
+INDEXED_TYPES = (list, tuple, dict, set, frozenset)
+
+
+class DapStream(JsonLineStream):
+    """
+    DAP messages, a JSON body with a `Content-Length` header.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        super().__init__(sock)
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def send(self, message: dict[str, Any]) -> None:
+        with self.lock:
+            self.seq += 1
+            body = json.dumps({"seq": self.seq, **message}, default=str).encode()
+            self.sock.sendall(DAP_HEADER + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+    def receive(self) -> dict[str, Any]:
+        length = None
+        while True:
+            line = self.reader.readline()
+            if not line:
+                raise EOFError("connection closed")
+            line = line.strip()
+            if not line:
+                break
+            if line.startswith(DAP_HEADER.strip()):
+                length = int(line[len(DAP_HEADER.strip()) :])
+        if length is None:
+            raise EOFError("missing Content-Length header")
+        return json.loads(self.reader.read(length))
+
+
+def is_dap_session(sock: socket.socket) -> bool:
+    return sock.recv(len(DAP_MAGIC), socket.MSG_PEEK | socket.MSG_WAITALL) == DAP_MAGIC
+
+
+class DapDebugger(RpcDebugger):
+    resume_methods = frozenset(
+        {"continue", "next", "stepIn", "stepOut", "disconnect", "terminate"}
+    )
+    stream_class = DapStream
+
+    def __init__(self, sock: socket.socket, skip: Iterable[str] | None = None):
+        super().__init__(sock, skip=skip)
+        self.thread_id = threading.get_ident()
+        self.configured = False
+        self.pending_stop: dict[str, Any] | None = None
+        self.references: list[tuple[str, Any]] = []
+
+    def send_stopped(self, event: dict[str, Any]) -> None:
+        self.references.clear()
+        if not self.configured:
+            # the editor is still configuring, it will be told after
+            self.pending_stop = event
+            return
+        body: dict[str, Any] = {
+            "reason": STOP_REASONS.get(event["reason"], event["reason"]),
+            "threadId": self.thread_id,
+            "allThreadsStopped": False,
+        }
+        if exception := event.get("exception"):
+            body["description"] = exception["type"]
+            body["text"] = exception["repr"]
+        self.send_event("stopped", body)
+
+    def send_event(self, event: str, body: dict[str, Any] | None = None) -> None:
+        self.stream.send({"type": "event", "event": event, "body": body or {}})
+
+    def handle_request(self, request: dict[str, Any]) -> bool:
+        command = request.get("command", "")
+        response: dict[str, Any] = {
+            "type": "response",
+            "request_seq": request.get("seq"),
+            "command": command,
+            "success": True,
+        }
+        handler = getattr(self, f"dap_{_snake_case(command)}", None)
+        try:
+            if handler is None:
+                raise RpcError(f"Unsupported command {command!r}")
+            response["body"] = handler(request.get("arguments") or {}) or {}
+        except Exception as e:
+            response["success"] = False
+            response["message"] = str(e) if isinstance(e, RpcError) else repr(e)
+        self.stream.send(response)
+
+        if command == "initialize" and response["success"]:
+            self.send_event("initialized")
+        if command == "configurationDone" and self.pending_stop is not None:
+            self.configured = True
+            event, self.pending_stop = self.pending_stop, None
+            self.send_stopped(event)
+        resume = command in self.resume_methods and response["success"]
+        if resume:
+            self.references.clear()
+            if self.detaching and command not in ("disconnect", "terminate"):
+                self.send_event("terminated")
+        return resume
+
+    # =========== requests ===========
+
+    def dap_initialize(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "supportsConfigurationDoneRequest": True,
+            "supportsConditionalBreakpoints": True,
+            "supportsEvaluateForHovers": True,
+            "supportsTerminateRequest": True,
+        }
+
+    def dap_attach(self, arguments: dict[str, Any]) -> None: ...
+
+    dap_launch = dap_attach
+
+    def dap_configuration_done(self, arguments: dict[str, Any]) -> None:
+        self.configured = True
+
+    def dap_set_breakpoints(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        filename = self.canonic(arguments["source"]["path"])
+        self.clear_all_file_breaks(filename)
+        result = []
+        for breakpoint in arguments.get("breakpoints") or []:
+            line = breakpoint["line"]
+            error = self.set_break(filename, line, cond=breakpoint.get("condition"))
+            if error:
+                result.append({"verified": False, "line": line, "message": error})
+            else:
+                number = self.get_breaks(filename, line)[-1].number
+                result.append({"verified": True, "line": line, "id": number})
+        return {"breakpoints": result}
+
+    def dap_threads(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "threads": [{"id": self.thread_id, "name": threading.current_thread().name}]
+        }
+
+    def dap_stack_trace(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        start = arguments.get("startFrame") or 0
+        levels = arguments.get("levels") or 0
+        # the innermost frame first
+        indexes = list(range(len(self.stack) - 1, -1, -1))
+        frames = []
+        for index in indexes[start : start + levels if levels else None]:
+            frame = self._describe_frame(index)
+            frames.append(
+                {
+                    "id": index + 1,
+                    "name": frame["name"],
+                    "source": {
+                        "name": os.path.basename(frame["filename"]),
+                        "path": frame["filename"],
+                    },
+                    "line": frame["lineno"],
+                    "column": 1,
+                    **({"presentationHint": "subtle"} if frame["hidden"] else {}),
+                }
+            )
+        return {"stackFrames": frames, "totalFrames": len(self.stack)}
+
+    def dap_scopes(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        index = arguments["frameId"] - 1
+        frame = self._get_frame(index)
+        return {
+            "scopes": [
+                {
+                    "name": "Locals",
+                    "presentationHint": "locals",
+                    "variablesReference": self._reference("locals", index),
+                    "namedVariables": len(self._get_locals(index)),
+                    "expensive": False,
+                },
+                {
+                    "name": "Globals",
+                    "variablesReference": self._reference("globals", index),
+                    "namedVariables": len(frame.f_globals),
+                    "expensive": True,
+                },
+            ]
+        }
+
+    def dap_variables(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        reference = arguments["variablesReference"]
+        if not 0 < reference <= len(self.references):
+            raise RpcError(f"Unknown variables reference {reference}")
+        kind, target = self.references[reference - 1]
+        if kind == "locals":
+            items: Iterable[tuple[str, Any]] = self._get_locals(target).items()
+        elif kind == "globals":
+            items = self._get_frame(target).f_globals.items()
+        else:
+            items = iter_children(target)
+        start = arguments.get("start") or 0
+        count = arguments.get("count") or DEFAULT_PAGE_SIZE
+        page = list(islice(items, start, start + count + 1))
+        variables = [self._variable(name, value) for name, value in page[:count]]
+        if len(page) > count and not arguments.get("count"):
+            variables.append(
+                {
+                    "name": "...",
+                    "value": f"only the first {count} items are shown",
+                    "variablesReference": 0,
+                }
+            )
+        return {"variables": variables}
+
+    def dap_evaluate(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        frame_id = arguments.get("frameId")
+        index = None if frame_id is None else frame_id - 1
+        frame = self._get_frame(index)
+        try:
+            value = eval(
+                arguments["expression"], frame.f_globals, self._get_locals(index)
+            )
+        except Exception as e:
+            raise RpcError(f"{type(e).__qualname__}: {e}") from None
+        variable = self._variable("", value)
+        variable["result"] = variable.pop("value")
+        return variable
+
+    def dap_continue(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        self.rpc_continue()
+        return {"allThreadsContinued": False}
+
+    def dap_next(self, arguments: dict[str, Any]) -> None:
+        self.rpc_next()
+
+    def dap_step_in(self, arguments: dict[str, Any]) -> None:
+        self.rpc_step()
+
+    def dap_step_out(self, arguments: dict[str, Any]) -> None:
+        self.rpc_return()
+
+    def dap_disconnect(self, arguments: dict[str, Any]) -> None:
+        self.rpc_detach()
+
+    dap_terminate = dap_disconnect
+
+    # =========== helpers ===========
+
+    def _reference(self, kind: str, target: Any) -> int:
+        self.references.append((kind, target))
+        return len(self.references)
+
+    def _variable(self, name: str, value: Any) -> dict[str, Any]:
+        variable: dict[str, Any] = {
+            "name": name,
+            "value": safe_repr(value, MAX_VALUE_REPR),
+            "type": type(value).__qualname__,
+            "variablesReference": 0,
+        }
+        if (size := children_size(value)) is not None:
+            variable["variablesReference"] = self._reference("value", value)
+            key = (
+                "indexedVariables"
+                if isinstance(value, INDEXED_TYPES)
+                else "namedVariables"
+            )
+            variable[key] = size
+        return variable
+
+
+def children_size(value: Any) -> int | None:
+    """
+    Return the number of children of a value, None if it can't be expanded.
+    """
+    if isinstance(value, (str, bytes, bytearray, int, float, complex, bool)):
+        return None
+    if isinstance(value, (dict, list, tuple, set, frozenset)):
+        return len(value) or None
+    attributes = getattr(value, "__dict__", None)
+    if isinstance(attributes, dict) and attributes:
+        return len(attributes)
+    return None
+
+
+def iter_children(value: Any) -> Iterable[tuple[str, Any]]:
+    if isinstance(value, dict):
+        return ((safe_repr(key), item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return ((str(index), item) for index, item in enumerate(value))
+    if isinstance(value, (set, frozenset)):
+        return ((str(index), item) for index, item in enumerate(value))
+    return iter(vars(value).items())
+
+
+def _snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
@@ -2,10 +2,16 @@ from __future__ import annotations
 
 import io
 import os
+import pprint
 import subprocess
 import sys
+import termios
+import threading
+import time
 import traceback
+import tty
 
+from collections import deque
 from contextlib import contextmanager, nullcontext, redirect_stderr, redirect_stdout
 from termios import tcdrain
 from types import TracebackType
@@ -32,28 +38,75 @@ from prompt_toolkit.output.vt100 import Vt100_Output as Vt100Output
 from rich import box
 from rich._inspect import Inspect as RichInspect
 from rich.console import Console, ConsoleDimensions, Group, RenderableType
+from rich.filesize import decimal
 from rich.panel import Panel
 from rich.pretty import Pretty
+from rich.protocol import is_renderable
 from rich.style import Style
 from rich.syntax import Syntax
 from rich.table import Table
 from rich.text import Text
-from rich.theme import Theme
 from rich.traceback import Frame, PathHighlighter, Stack, Trace, Traceback
 from rich.tree import Tree
 from typing_extensions import Concatenate, ParamSpec
 
-from . import utils
+from . import (
+    benchmark,
+    dap,
+    evaluation,
+    memory,
+    profiling,
+    recorder,
+    remote_render,
+    rpc,
+    threads,
+    utils,
+    watch,
+)
+from .completion import DEFAULT_COMPLETION_TIMEOUT, FrameCompleter
+from .pager import Pager
 
 
 if TYPE_CHECKING:
+    import pstats
     import socket
+    import tracemalloc
 
     from contextlib import AbstractContextManager
-    from types import FrameType
+    from types import CodeType, FrameType
     from typing import Any, Callable, Iterable
 
 
+# the commands running the debugged thread, they need its own stack
+EXECUTION_CMDS = {
+    "s",
+    "step",
+    "n",
+    "next",
+    "unt",
+    "until",
+    "r",
+    "return",
+    "c",
+    "cont",
+    "continue",
+    "j",
+    "jump",
+    "run",
+    "restart",
+    "debug",
+    "detach",
+    "q",
+    "quit",
+    "exit",
+}
+
+# the commands waiting for the client, they aren't bounded by the evaluation timeout
+INTERACTIVE_CMDS = {"interact"}
+# the commands running code for as long as it takes, only interrupted by Ctrl-C
+UNTIMED_CMDS = {"prof"}
+
+
 def default_hello_message(ip: str, port: int) -> str:
     return f"RemotePdb session open at {ip}:{port}, use 'plan-d debug {ip} {port}' to connect..."
 
@@ -92,6 +145,13 @@ class RemoteDebugger(RemoteIPythonDebugger):
         syntax_theme: str = "ansi_dark",
         exception_max_frames: int = 100,
         disable_magic_cmd: bool = False,
+        pager: bool = False,
+        client_render: bool = False,
+        headless: bool = False,
+        completion_timeout: float = DEFAULT_COMPLETION_TIMEOUT,
+        use_jedi: bool = False,
+        evaluation_timeout: float | None = evaluation.DEFAULT_EVALUATION_TIMEOUT,
+        result_budget: int | None = evaluation.DEFAULT_RESULT_BUDGET,
         **extra_pt_session_options,
     ) -> None:
         # fix annoying `Warning: Input is not a terminal (fd=0)`
@@ -148,29 +208,75 @@ class RemoteDebugger(RemoteIPythonDebugger):
             file=stdout,
             stderr=True,
             force_terminal=True,
-            force_interactive=True,
+            force_interactive=not headless,
+            color_system=None if headless else "auto",
             tab_size=4,
-            theme=Theme(
-                {"info": "dim cyan", "warning": "magenta", "danger": "bold red"}
-            ),
+            theme=remote_render.CONSOLE_THEME,
         )
         self.syntax_theme = syntax_theme
         self.skip_print_stack_entry = False
         self.exception_max_frames = exception_max_frames
         self.disable_magic_cmd = disable_magic_cmd
+        self.pager = pager and not headless
+        self.client_render = client_render
+        self.headless = headless
+        self.script_lines: deque[str] = deque()
+        self.detaching = False
+        self.thread_groups: list[threads.ThreadGroup] = []
+        # the stack of the debugged thread, while inspecting another thread
+        self.debugged_stack: tuple[list[tuple[FrameType, int]], int, dict] | None = None
+        self.watchpoints: dict[int, watch.Watchpoint] = {}
+        self.watched_codes: set[CodeType] = set()
+        self.next_watchpoint_number = 1
+        self.recorder: recorder.Recorder | None = None
+        # the number of the recorded event inspected by `rstep` and `rnext`
+        self.replay: int | None = None
+        self.evaluation_timeout = evaluation_timeout
+        self.result_budget = result_budget
+        # the guard of the running command, interrupted by the client's Ctrl-C
+        self.evaluation_guard: evaluation.EvaluationGuard | None = None
+
+        self.completer = FrameCompleter(
+            self._ptcomp,
+            lambda: (self.curframe, getattr(self, "curframe_locals", {})),
+            commands=[name[3:] for name in dir(self) if name.startswith("do_")],
+        )
+        self.config_completion(timeout=completion_timeout, use_jedi=use_jedi)
+        self.pt_app.completer = self.completer
 
     @classmethod
     @contextmanager
     def start(cls, sock: socket.socket):
         assert cls._get_current_instance() is None
         sock_fd = sock.fileno()
-        term_data = receive_message(sock_fd)
+        rpc_debugger: rpc.RpcDebugger | None = None
+        if dap.is_dap_session(sock):
+            rpc_debugger = dap.DapDebugger(sock)
+        else:
+            term_data = receive_message(sock_fd)
+            if not isinstance(term_data, dict):
+                term_data = {}
+            if term_data.get("mode") == rpc.JSONRPC_MODE:
+                rpc_debugger = rpc.RpcDebugger(sock)
+            elif "term_attrs" not in term_data:
+                # only the DAP clients don't start with a handshake
+                raise ValueError("Unknown debugger client handshake")
+        if rpc_debugger is not None:
+            cls._set_current_instance(rpc_debugger)  # type: ignore[arg-type]
+            try:
+                yield rpc_debugger
+            finally:
+                cls._set_current_instance(None)
+            return
+
         term_size: tuple[int, int]
         term_attrs, term_type, term_size = (
             term_data["term_attrs"],
             term_data["term_type"],
             term_data["term_size"],
         )
+        client_render = term_data.get("client_render", False)
+        headless = term_data.get("headless", False)
         rows, cols = term_size
         with PTY.open() as pty:
             pty.resize(rows, cols)
@@ -187,8 +293,15 @@ class RemoteDebugger(RemoteIPythonDebugger):
                 slave_reader = os.fdopen(pty.slave_fd, "r", encoding="utf-8")
                 slave_writer = os.fdopen(pty.slave_fd, "w", encoding="utf-8")
                 try:
-                    instance = cls(slave_reader, slave_writer, term_type)
+                    instance = cls(
+                        slave_reader,
+                        slave_writer,
+                        term_type,
+                        client_render=client_render,
+                        headless=headless,
+                    )
                     instance.console.size = ConsoleDimensions(cols, rows)
+                    instance.queue_commands(term_data.get("commands") or [])
                     cls._set_current_instance(instance)
                     yield instance
                 except Exception:
@@ -273,6 +386,18 @@ class RemoteDebugger(RemoteIPythonDebugger):
             source=True,
         )
 
+    def do_p(self, arg):
+        """p expression
+        Print the value of the expression.
+        """
+        self.message_value(arg, repr)
+
+    def do_pp(self, arg):
+        """pp expression
+        Pretty-print the value of the expression.
+        """
+        self.message_value(arg, pprint.pformat)
+
     # These commands is referenced from https://github.com/cansarigol/pdbr/tree/master/pdbr
     def do_v(self, arg):
         """v(ars)
@@ -310,8 +435,289 @@ class RemoteDebugger(RemoteIPythonDebugger):
 
     do_ia = do_inspectall
 
+    def do_pager(self, arg):
+        """pager [on|off]
+        Show or toggle paging of outputs taller than the terminal.
+        """
+        arg = arg.strip().lower()
+        if arg in ("on", "off"):
+            self.pager = arg == "on"
+        elif arg:
+            self.error("Usage: pager [on|off]")
+            return
+        self.message(f"Pager is {'on' if self.pager else 'off'}")
+
+    def do_limits(self, arg):
+        """limits [timeout seconds | budget bytes]
+        Show or set the bounds of the commands: the timeout of the evaluations,
+        0 to disable it, extended by the duration of `top` and `bench`, and the
+        memory budget of the results, the containers deeper than it and the
+        results rendering longer are reported instead of rendered. `prof` has no
+        timeout, Ctrl-C interrupts any running command.
+        """
+        name, *args = arg.split() or [""]
+        if name == "timeout" and len(args) == 1:
+            self.config_evaluation(timeout=float(args[0]))
+        elif name == "budget" and len(args) == 1:
+            self.config_evaluation(result_budget=int(args[0]))
+        elif name:
+            self.error("Usage: limits [timeout seconds | budget bytes]")
+            return
+        timeout = f"{self.evaluation_timeout:g}s" if self.evaluation_timeout else "none"
+        budget = decimal(self.result_budget) if self.result_budget else "none"
+        self.message(f"Evaluation timeout: {timeout}, result budget: {budget}")
+
+    def do_mem(self, arg):
+        """mem [start [nframes] | snapshot | top [limit] | stop]
+        Without argument, list the deep sizes of the local variables.
+        start: trace the allocations with tracemalloc, keeping nframes frames.
+        snapshot: take a snapshot of the traced allocations, for memdiff.
+        top: list the top allocation sites.
+        stop: stop tracing and drop the snapshots.
+        """
+        command, *args = arg.split() or [""]
+        if command == "":
+            self.message(self.get_mem_table())
+        elif command == "start" and len(args) <= 1:
+            nframes = int(args[0]) if args else 1
+            if memory.start_tracing(nframes):
+                self.message(f"Tracing allocations, keeping {nframes} frame(s)")
+            else:
+                self.message("Allocations are already traced")
+        elif command == "snapshot" and not args:
+            self.message(f"Snapshot {memory.add_snapshot()} taken")
+        elif command == "top" and len(args) <= 1:
+            limit = int(args[0]) if args else memory.DEFAULT_TOP_LIMIT
+            self.message(self.get_allocations_table(memory.take_snapshot(), limit))
+        elif command == "stop" and not args:
+            memory.stop_tracing()
+            self.message("Stopped tracing allocations")
+        else:
+            self.error("Usage: mem [start [nframes] | snapshot | top [limit] | stop]")
+
+    def do_memdiff(self, arg):
+        """memdiff [snapshot1 [snapshot2]]
+        List the allocation sites that changed the most between two snapshots
+        taken by `mem snapshot`, by default between the last one and now.
+        """
+        numbers = [int(number) for number in arg.split()]
+        if len(numbers) > 2:
+            self.error("Usage: memdiff [snapshot1 [snapshot2]]")
+            return
+        if not numbers and not memory.snapshots:
+            self.error("No snapshot taken, run `mem snapshot` first")
+            return
+        old = memory.get_snapshot(numbers[0] if numbers else len(memory.snapshots))
+        new = (
+            memory.get_snapshot(numbers[1])
+            if len(numbers) == 2
+            else memory.take_snapshot()
+        )
+        self.message(self.get_allocations_diff_table(old, new))
+
+    def do_prof(self, arg):
+        """prof statement
+        Run the statement in the current frame under cProfile and list the
+        functions which spent the most time.
+        """
+        if not arg.strip():
+            self.error("Usage: prof statement")
+            return
+        stats = profiling.profile_statement(
+            arg, self.curframe.f_globals, self.curframe_locals
+        )
+        self.message(self.get_profile_table(stats))
+
+    def do_bench(self, arg):
+        """bench statement [| statement ...]
+        Time statements against the data of the current frame and compare them.
+        Each one is warmed up, run in loops calibrated to a few milliseconds for
+        one second, with its peak memory and the memory blocks a loop leaves
+        allocated. Use parentheses for a bitwise or: `(a | b)`.
+        """
+        statements = benchmark.split_statements(arg)
+        if not statements:
+            self.error("Usage: bench statement [| statement ...]")
+            return
+        # the frame's objects themselves, the statements only rebind their own names
+        namespace = {**self.curframe.f_globals, **self.curframe_locals}
+        self.extend_evaluation(len(statements) * benchmark.DEFAULT_BENCH_DURATION)
+        self.message(f"Benchmarking {len(statements)} statement(s)...")
+        results = []
+        for statement in statements:
+            try:
+                results.append(benchmark.bench_statement(statement, namespace))
+            except Exception as e:
+                self.error(f"{statement}: {type(e).__qualname__}: {e}", markup=False)
+                return
+        self.message(self.get_bench_table(results))
+
+    def do_top(self, arg):
+        """top [seconds]
+        Sample the stacks of the other threads while this one is paused (for one
+        second by default) and show where they spend their time.
+        """
+        duration = float(arg) if arg.strip() else profiling.DEFAULT_SAMPLE_DURATION
+        self.extend_evaluation(duration)
+        self.message(f"Sampling the other threads for {duration:g}s...")
+        samples = profiling.sample_stacks(
+            duration,
+            exclude_threads=self.get_debugger_threads(),
+            exclude_paths=self.get_debugger_paths(),
+        )
+        self.message(self.get_samples_tree(samples))
+
+    def do_threads(self, arg):
+        """threads
+        List the stacks of all the threads, the identical stacks are grouped.
+        The debugged thread is number 0, see `thread` to inspect the others.
+        """
+        self.thread_groups = threads.group_thread_stacks(
+            exclude_threads=self.get_debugger_threads(),
+            exclude_paths=self.get_debugger_paths(),
+        )
+        stack = self.debugged_stack[0] if self.debugged_stack else self.stack
+        current = threading.current_thread().name
+        self.message(self.get_thread_group(0, [current], stack))
+        for number, group in enumerate(self.thread_groups, 1):
+            self.message(self.get_thread_group(number, group.names, group.stack))
+
+    def do_thread(self, arg):
+        """thread [number]
+        Switch to the stack of a thread listed by `threads`, to inspect it.
+        Without argument, or with 0, switch back to the debugged thread, which is
+        also done before running it.
+        """
+        number = int(arg) if arg.strip() else 0
+        if number == 0:
+            if self.restore_debugged_stack():
+                self.print_stack_entry(self.stack[self.curindex])
+            return
+        if not 0 < number <= len(self.thread_groups):
+            self.error(f"No thread {number}, run `threads` to list them")
+            return
+        group = self.thread_groups[number - 1]
+        if self.debugged_stack is None:
+            self.debugged_stack = (self.stack, self.curindex, self.curframe_locals)
+        self.stack, self.curindex = group.stack, len(group.stack) - 1
+        self.curframe = self.stack[self.curindex][0]
+        self.curframe_locals = self.curframe.f_locals
+        self.message(f"Inspecting {', '.join(group.names)}, the thread keeps running")
+        self.print_stack_entry(self.stack[self.curindex])
+
+    def do_watch(self, arg):
+        """watch [expression]
+        Stop when the value of the expression changes, in the code of the
+        current frame. Without argument, list the watchpoints.
+        """
+        if not arg.strip():
+            self.message(self.get_watchpoints_table())
+            return
+        try:
+            watchpoint = watch.Watchpoint(
+                self.next_watchpoint_number, arg.strip(), self.curframe
+            )
+        except SyntaxError as e:
+            self.error(f"SyntaxError: {e}")
+            return
+        if watchpoint.value is watch.UNAVAILABLE:
+            self.error(f"{arg.strip()!r} can't be evaluated in the current frame")
+            return
+        self.next_watchpoint_number += 1
+        self.watchpoints[watchpoint.number] = watchpoint
+        self.watched_codes |= watchpoint.scope
+        self.message(
+            f"Watchpoint {watchpoint.number}: {watchpoint.expression} = "
+            f"{rpc.safe_repr(watchpoint.value)}",
+            markup=False,
+        )
+
+    def do_unwatch(self, arg):
+        """unwatch [number ...]
+        Delete the watchpoints, all of them without argument.
+        """
+        numbers = [int(number) for number in arg.split()] or list(self.watchpoints)
+        for number in numbers:
+            if self.watchpoints.pop(number, None) is None:
+                self.error(f"No watchpoint {number}")
+            else:
+                self.message(f"Deleted watchpoint {number}")
+        self.watched_codes = {
+            code
+            for watchpoint in self.watchpoints.values()
+            for code in watchpoint.scope
+        }
+
+    def do_record(self, arg):
+        """record [capacity | stop]
+        Record the lines run by the current frame and the frames it calls, with
+        the changes of their local variables, keeping the last `capacity` events
+        (10000 by default). See `rstep` and `rnext` to go back in the recording.
+        Without argument, show the state of the recording.
+        """
+        arg = arg.strip()
+        if arg == "stop":
+            if self.recorder is not None:
+                self.recorder.stop()
+        elif arg.isdecimal() and int(arg) > 0:
+            self.start_recording(self.curframe, int(arg))
+        elif arg:
+            self.error("Usage: record [capacity | stop], with a positive capacity")
+            return
+        elif self.recorder is None:
+            self.start_recording(self.curframe)
+        if self.recorder is None:
+            self.message("Nothing recorded")
+            return
+        self.message(
+            f"{'Recording' if self.recorder.active else 'Recorded'} "
+            f"{len(self.recorder)} events (capacity {self.recorder.capacity}, "
+            f"{self.recorder.count} in total)"
+        )
+
+    def do_rstep(self, arg):
+        """rstep [count]
+        Go back to the previous recorded line, in any frame.
+        A negative count goes forward.
+        """
+        self.replay_lines(int(arg) if arg.strip() else 1, over_calls=False)
+
+    def do_rnext(self, arg):
+        """rnext [count]
+        Go back to the previous recorded line of the same frame or its callers,
+        over the calls. A negative count goes forward.
+        """
+        self.replay_lines(int(arg) if arg.strip() else 1, over_calls=True)
+
+    def do_detach(self, arg):
+        """detach
+        Clear all breakpoints and snapshots, continue the execution and close the
+        connection.
+        """
+        self.detaching = True
+        self.clear_all_breaks()
+        self.watchpoints.clear()
+        self.watched_codes.clear()
+        if self.recorder is not None:
+            self.recorder.stop()
+        memory.snapshots.clear()
+        return self.do_continue(arg)
+
     # =========== override methods ===========
 
+    def interaction(self, *args, **kwargs):
+        super().interaction(*args, **kwargs)
+        if self.detaching:
+            self.detaching = False
+            self._on_done()
+
+    def precmd(self, line: str) -> str:
+        if self.script_lines and line == self.script_lines[0]:
+            # echo the queued commands, as if they were typed
+            self.script_lines.popleft()
+            self.message(f"{self.prompt}{line}", markup=False, highlight=False)
+        return super().precmd(line)
+
     def onecmd(self, line: str) -> bool:
         """
         Invokes 'run_magic()' if the line starts with a '%'.
@@ -321,66 +727,142 @@ class RemoteDebugger(RemoteIPythonDebugger):
         try:
             with self.redirect_std_stream_to_console():
                 line = line.strip()
-                if line.startswith("%") and not self.disable_magic_cmd:
-                    if line.startswith("%%"):
-                        self.error(
-                            "Cell magics (multiline) are not yet supported. "
-                            "Use a single '%' instead."
-                        )
+                command = self.parseline(line)[0]
+                if command in EXECUTION_CMDS:
+                    self.restore_debugged_stack()
+                    self.replay = None
+                with self.bound_evaluation(command):
+                    if line.startswith("%") and not self.disable_magic_cmd:
+                        if line.startswith("%%"):
+                            self.error(
+                                "Cell magics (multiline) are not yet supported. "
+                                "Use a single '%' instead."
+                            )
+                            return False
+                        self.run_magic(line[1:])
                         return False
-                    self.run_magic(line[1:])
-                    return False
-                return super().onecmd(line)
+                    return super().onecmd(line)
 
+        except evaluation.EvaluationInterrupted as e:
+            self.error(str(e))
+            return False
         except Exception as e:
             self.error(f"{type(e).__qualname__} in onecmd({line!r}): {e}")
             return False
 
     @as_console_printer
     def error(self, msg, *args, **kwargs) -> None:
+        if self.render_on_client(msg, *args, **kwargs):
+            return
         self.console.print(msg, *args, **kwargs)
 
     @as_console_printer
     def message(self, msg, *args, **kwargs) -> None:
+        if self.render_on_client(msg, *args, pager=self.pager, **kwargs):
+            return
+        if (
+            self.pager
+            and not args
+            and set(kwargs) <= {"soft_wrap"}
+            and is_renderable(msg)
+        ):
+            Pager(self.console, self.read_key).page(msg, **kwargs)
+            return
         self.console.print(msg, *args, **kwargs)
 
+    def displayhook(self, obj: Any) -> None:
+        if obj is not None:
+            self.message_result(obj, repr)
+
+    def _error_exc(self) -> None:
+        exc = sys.exc_info()[1]
+        if isinstance(exc, evaluation.EvaluationInterrupted):
+            self.error(str(exc))
+            return
+        super()._error_exc()  # type: ignore[misc]
+
     def setup(self, f: FrameType | None, tb: TracebackType | None) -> None:
+        self.debugged_stack = None
+        self.replay = None
+        if f is not None:
+            for watchpoint in self.watchpoints.values():
+                watchpoint.reset(f)
         if tb:
             import decorator
 
             import plan_d
 
-            self.console.print_exception(
-                word_wrap=True,
-                suppress=[plan_d, decorator],
-                max_frames=self.exception_max_frames,
+            self.message(
+                Traceback(
+                    word_wrap=True,
+                    suppress=[plan_d, decorator],
+                    max_frames=self.exception_max_frames,
+                )
             )
             self.skip_print_stack_entry = True
 
         return super().setup(f, tb)
 
-    def print_stack_trace(self, context=None):
-        tb = Traceback(
-            Trace(
-                stacks=[
-                    Stack(
-                        is_cause=False,
-                        exc_type="",
-                        exc_value="",
-                        frames=[
-                            Frame(
-                                frame.f_code.co_filename,
-                                lineno=lineno,
-                                name=frame.f_code.co_name,
-                            )
-                            for frame, lineno in self.stack
-                            if frame.f_locals.get("__tracebackhide__") is not True
-                        ],
-                    )
-                ]
-            )
+    def trace_dispatch(self, frame: FrameType, event: str, arg: Any):
+        if self.recorder is not None and self.recorder.active:
+            try:
+                self.recorder.record(frame, event)
+            except Exception as e:
+                # the program goes on without the recording
+                self.recorder.stop()
+                self.error(f"Recording stopped, {type(e).__qualname__}: {e}")
+            if not self.recorder.active and self.continuing_untraced():
+                # the recorded frame returned, like `Bdb.set_continue` without
+                # breakpoints, run without the debugger overhead
+                self.stop_tracing()
+                return None
+        return super().trace_dispatch(frame, event, arg)
+
+    def break_anywhere(self, frame: FrameType) -> bool:
+        return (
+            frame.f_code in self.watched_codes
+            or (self.recorder is not None and self.recorder.is_recorded(frame))
+            or super().break_anywhere(frame)
         )
-        self.message(tb, soft_wrap=False)
+
+    def break_here(self, frame: FrameType) -> bool:
+        changes = self.check_watchpoints(frame) if self.watchpoints else None
+        if super().break_here(frame):
+            return True
+        if changes:
+            # not stopped by a breakpoint, don't run the commands of the last one
+            self.currentbp = 0
+            self.message(self.get_watchpoint_changes_table(changes))
+            return True
+        return False
+
+    def set_continue(self) -> None:
+        if not self.watchpoints and not (self.recorder and self.recorder.active):
+            return super().set_continue()
+        # keep tracing the watched and recorded code, the other frames are not traced
+        self._set_stopinfo(self.botframe, None, -1)  # type: ignore[attr-defined]
+        return None
+
+    def continuing_untraced(self) -> bool:
+        """
+        Whether the program continues with nothing left to stop it but the end.
+        """
+        return (
+            self.stopframe is self.botframe
+            and self.stoplineno == -1
+            and not self.breaks
+            and not self.watchpoints
+        )
+
+    def stop_tracing(self) -> None:
+        sys.settrace(None)
+        frame = sys._getframe().f_back
+        while frame and frame is not self.botframe:
+            del frame.f_trace
+            frame = frame.f_back
+
+    def print_stack_trace(self, context=None):
+        self.message(self.get_stack_traceback(self.stack), soft_wrap=False)
 
     def print_stack_entry(
         self,
@@ -468,6 +950,245 @@ class RemoteDebugger(RemoteIPythonDebugger):
 
     # =========== methods ===========
 
+    def queue_commands(self, commands: Iterable[str]) -> None:
+        """
+        Run the commands at the next stop, before prompting the client.
+        """
+        for command in commands:
+            command = command.strip()
+            if command and not command.startswith("#"):
+                self.cmdqueue.append(command)
+                self.script_lines.append(command)
+
+    def config_completion(
+        self, timeout: float | None = None, use_jedi: bool | None = None
+    ) -> None:
+        """
+        Set the time budget of IPython completions, and whether they use jedi.
+
+        A zero timeout always completes from the cheap per-frame index.
+        """
+        if timeout is not None:
+            self.completer.timeout = timeout
+        if use_jedi is not None:
+            self._ptcomp.ipy_completer.use_jedi = use_jedi  # type: ignore[union-attr]
+
+    def config_evaluation(
+        self, timeout: float | None = None, result_budget: int | None = None
+    ) -> None:
+        """
+        Set the timeout of the commands, and the memory budget of their results.
+
+        Zero disables them.
+        """
+        if timeout is not None:
+            self.evaluation_timeout = timeout
+        if result_budget is not None:
+            self.result_budget = result_budget
+
+    @contextmanager
+    def bound_evaluation(self, command: str | None):
+        """
+        Interrupt the command at its timeout or on the client's Ctrl-C.
+        """
+        if (
+            command in EXECUTION_CMDS
+            or command in INTERACTIVE_CMDS
+            or self.evaluation_guard is not None
+        ):
+            yield
+            return
+        guard = self.evaluation_guard = evaluation.EvaluationGuard(
+            None if command in UNTIMED_CMDS else self.evaluation_timeout
+        )
+        try:
+            with guard:
+                yield
+        finally:
+            guard.close()
+            self.evaluation_guard = None
+
+    def extend_evaluation(self, seconds: float) -> None:
+        """
+        Extend the timeout of the running command by the duration it was asked for.
+        """
+        if self.evaluation_guard is not None:
+            self.evaluation_guard.extend(seconds)
+
+    def interrupt_evaluation(self) -> bool:
+        """
+        Interrupt the running command, return False if there is none.
+        """
+        guard = self.evaluation_guard
+        return guard is not None and guard.interrupt()
+
+    def check_result_size(self, value: Any) -> bool:
+        """
+        Report the containers over the result budget, return whether to render them.
+
+        Only the builtin containers are measured, as their repr renders all the
+        objects they reference, unlike most objects.
+        """
+        if not self.result_budget or not isinstance(
+            value, evaluation.RENDERED_CONTAINERS
+        ):
+            return True
+        size = memory.deep_sizeof(
+            value, deadline=time.monotonic() + evaluation.RESULT_SIZE_TIME_BUDGET
+        )
+        if size.size <= self.result_budget:
+            return True
+        self.error(
+            f"The {type(value).__qualname__} result takes "
+            f"{'' if size.complete else 'at least '}{decimal(size.size)} in "
+            f"{size.objects} objects, over the {decimal(self.result_budget)} budget: "
+            "not rendered (see `limits`)",
+            markup=False,
+        )
+        return False
+
+    def message_value(self, arg: str, render: Callable[[Any], str]) -> None:
+        try:
+            value = self._getval(arg)
+        except (Exception, evaluation.EvaluationInterrupted):
+            # reported by _getval
+            return
+        self.message_result(value, render)
+
+    def message_result(self, value: Any, render: Callable[[Any], str]) -> None:
+        """
+        Print a result rendered by `render`, within the result budget.
+        """
+        if not self.check_result_size(value):
+            return
+        text = render(value)
+        if self.result_budget and len(text) > self.result_budget:
+            self.error(
+                f"The {type(value).__qualname__} result renders to {len(text):,} "
+                f"characters, over the {decimal(self.result_budget)} budget: "
+                "not rendered (see `limits`)",
+                markup=False,
+            )
+            return
+        self.message(text)
+
+    def start_recording(
+        self, frame: FrameType, capacity: int = recorder.DEFAULT_CAPACITY
+    ) -> None:
+        if self.recorder is not None:
+            self.recorder.stop()
+        self.recorder = recorder.Recorder(frame, capacity)
+        self.replay = None
+
+    def replay_lines(self, count: int, over_calls: bool) -> None:
+        """
+        Move `count` recorded lines backward, forward if negative.
+        """
+        if self.recorder is None or not len(self.recorder):
+            self.error("Nothing recorded, see `record`")
+            return
+        current: recorder.RecordedEvent | None
+        if self.replay is not None:
+            current = self.recorder.event(self.replay)
+        elif (current := self.recorder.previous_line(self.recorder.count)) is None:
+            self.error("No line recorded yet")
+            return
+        event = current
+        for _ in range(abs(count)):
+            depth = event.depth if over_calls else None
+            found = (
+                self.recorder.previous_line(event.number, depth)
+                if count > 0
+                else self.recorder.next_line(event.number, depth)
+            )
+            if found is None:
+                break
+            event = found
+        if event is current:
+            self.error(
+                "At the beginning of the recording"
+                if count > 0
+                else "At the end of the recording"
+            )
+            return
+        self.replay = event.number
+        self.message(self.get_recorded_event(event), soft_wrap=False)
+
+    def check_watchpoints(
+        self, frame: FrameType
+    ) -> list[tuple[watch.Watchpoint, Any, Any]]:
+        if frame.f_code not in self.watched_codes:
+            return []
+        changes = []
+        for watchpoint in self.watchpoints.values():
+            if frame.f_code in watchpoint.scope and (
+                change := watchpoint.update(frame)
+            ):
+                changes.append((watchpoint, *change))
+        return changes
+
+    def restore_debugged_stack(self) -> bool:
+        """
+        Switch back to the stack of the debugged thread, after `thread`.
+        """
+        if self.debugged_stack is None:
+            return False
+        self.stack, self.curindex, self.curframe_locals = self.debugged_stack
+        self.curframe = self.stack[self.curindex][0]
+        self.debugged_stack = None
+        return True
+
+    def get_debugger_threads(self) -> list[int]:
+        """
+        The threads of the debugger itself, running the prompt and completions.
+        """
+        debugger_threads = [
+            thread
+            for executor in (self.thread_executor, self.completer.executor)
+            for thread in executor._threads  # type: ignore[attr-defined]
+        ]
+        if self.evaluation_guard is not None and self.evaluation_guard.timer:
+            debugger_threads.append(self.evaluation_guard.timer)
+        return [thread.ident for thread in debugger_threads if thread.ident is not None]
+
+    def get_debugger_paths(self) -> list[str]:
+        import madbg
+
+        import plan_d
+
+        return [os.path.dirname(path) for path in (plan_d.__file__, madbg.__file__)]
+
+    def render_on_client(self, *objects, pager: bool = False, **kwargs) -> bool:
+        """
+        Send the objects to be rendered by the client, if the client supports it.
+
+        Return False when the objects have to be rendered by the server.
+        """
+        if not self.client_render:
+            return False
+        message = remote_render.dump_message(
+            objects, kwargs, syntax_theme=self.syntax_theme, pager=pager
+        )
+        if message is None:
+            return False
+        self.stdout.write(remote_render.encode_message(message))
+        self.stdout.flush()
+        return True
+
+    def read_key(self) -> str:
+        """
+        Read a single key press from the client without waiting for a newline.
+        """
+        fd = self.stdin.fileno()
+        old_attrs = termios.tcgetattr(fd)
+        guard = self.evaluation_guard
+        try:
+            tty.setcbreak(fd)
+            with guard.suspended() if guard else nullcontext():
+                return os.read(fd, 1).decode(errors="ignore")
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_attrs)
+
     def run_magic(self, line) -> str:
         magic_name, arg, line = self.parseline(line)
         result = stdout = ""
@@ -496,13 +1217,13 @@ class RemoteDebugger(RemoteIPythonDebugger):
                     result = magic_fn(
                         arg,
                         local_ns={
-                            **self.curframe_locals,
                             **f_globals,
+                            **self.curframe_locals,
                         },
                     )
                 else:
                     result = magic_fn(arg)
-        if result is not None:
+        if result is not None and self.check_result_size(result):
             self.message("")
             self.message(result)
         return result
@@ -553,6 +1274,250 @@ class RemoteDebugger(RemoteIPythonDebugger):
         [table.add_row(variable, value, _type) for variable, value, _type in variables]
         return table
 
+    def get_mem_table(self) -> Table | None:
+        namespace = {
+            k: v
+            for k, v in getattr(self, "curframe_locals", {}).items()
+            if not k.startswith("__")
+        }
+        if not namespace:
+            return None
+        table = Table(title="Deep size of local variables", box=box.MINIMAL)
+
+        table.add_column("Variable", style="cyan")
+        table.add_column("Size", style="magenta", justify="right")
+        table.add_column("Objects", justify="right")
+        table.add_column("Type", style="green")
+        incomplete = False
+        for variable, value, deep_size in memory.deep_sizes(namespace):
+            size = decimal(deep_size.size)
+            if not deep_size.complete:
+                incomplete = True
+                size = f">= {size}"
+            table.add_row(variable, size, str(deep_size.objects), str(type(value)))
+        if incomplete:
+            table.caption = "'>=' sizes stopped at the traversal limits"
+        return table
+
+    def get_allocations_table(
+        self, snapshot: tracemalloc.Snapshot, limit: int
+    ) -> Table:
+        table = Table(title="Top allocation sites", box=box.MINIMAL)
+
+        table.add_column("Location", style="cyan")
+        table.add_column("Size", style="magenta", justify="right")
+        table.add_column("Blocks", style="green", justify="right")
+        for stat in memory.top_allocations(snapshot, limit):
+            table.add_row(
+                memory.format_location(stat.traceback),
+                decimal(stat.size),
+                str(stat.count),
+            )
+        return table
+
+    def get_allocations_diff_table(
+        self, old: tracemalloc.Snapshot, new: tracemalloc.Snapshot
+    ) -> Table:
+        table = Table(title="Allocation differences", box=box.MINIMAL)
+
+        table.add_column("Location", style="cyan")
+        table.add_column("Size diff", style="magenta", justify="right")
+        table.add_column("Size", justify="right")
+        table.add_column("Blocks diff", style="green", justify="right")
+        for stat in memory.diff_allocations(old, new):
+            sign = "-" if stat.size_diff < 0 else "+"
+            table.add_row(
+                memory.format_location(stat.traceback),
+                f"{sign}{decimal(abs(stat.size_diff))}",
+                decimal(stat.size),
+                f"{stat.count_diff:+d}",
+            )
+        return table
+
+    def get_profile_table(self, stats: pstats.Stats) -> Table:
+        table = Table(title="Hottest functions", box=box.MINIMAL)
+
+        table.add_column("Function", style="cyan")
+        table.add_column("Calls", justify="right")
+        table.add_column("Total time", style="magenta", justify="right")
+        table.add_column("Cumulative time", style="green", justify="right")
+        for row in profiling.hottest_functions(stats):
+            table.add_row(
+                row.function,
+                row.calls,
+                f"{row.total_time:.6f}",
+                f"{row.cumulative_time:.6f}",
+            )
+        return table
+
+    def get_bench_table(self, results: list[benchmark.BenchResult]) -> Table:
+        table = Table(title="Benchmark", box=box.MINIMAL)
+
+        table.add_column("Statement", style="cyan")
+        table.add_column("Loops", justify="right")
+        table.add_column("Min", style="magenta", justify="right")
+        table.add_column("Median", style="magenta", justify="right")
+        table.add_column("P95", justify="right")
+        table.add_column("P99", justify="right")
+        table.add_column("Relative", style="green", justify="right")
+        table.add_column("Peak memory", justify="right")
+        table.add_column("Retained blocks / loop", justify="right")
+        fastest = min(result.median for result in results)
+        for result in results:
+            table.add_row(
+                result.statement,
+                f"{result.loops} x {len(result.times)}",
+                benchmark.format_duration(result.min),
+                benchmark.format_duration(result.median),
+                benchmark.format_duration(result.p95),
+                benchmark.format_duration(result.p99),
+                f"{result.median / fastest:.2f}x" if fastest else "-",
+                "-" if result.peak_memory is None else decimal(result.peak_memory),
+                f"{result.retained_blocks:.2f}",
+            )
+        table.caption = "Times per loop, memory per run of the statement"
+        if any(result.traced for result in results):
+            table.caption += ", slowed down by the tracing of `mem start`"
+        return table
+
+    def get_samples_tree(
+        self, samples: profiling.SampleNode, min_fraction: float = 0.01
+    ) -> Tree | str:
+        if not samples.count:
+            return "No other thread is running"
+
+        def add_children(tree: Tree, node: profiling.SampleNode) -> None:
+            for child in node.sorted_children():
+                if child.count < samples.count * min_fraction:
+                    break
+                add_children(
+                    tree.add(
+                        Text.assemble(
+                            (child.name, "cyan"),
+                            " ",
+                            (f"{child.count / samples.count:.1%}", "magenta"),
+                            f" ({child.count})",
+                        )
+                    ),
+                    child,
+                )
+
+        tree = Tree(f"{samples.count} samples of the other threads")
+        add_children(tree, samples)
+        return tree
+
+    def get_stack_traceback(self, stack: list[tuple[FrameType, int]]) -> Traceback:
+        return Traceback(
+            Trace(
+                stacks=[
+                    Stack(
+                        is_cause=False,
+                        exc_type="",
+                        exc_value="",
+                        frames=[
+                            Frame(
+                                frame.f_code.co_filename,
+                                lineno=lineno,
+                                name=frame.f_code.co_name,
+                            )
+                            for frame, lineno in stack
+                            if frame.f_locals.get("__tracebackhide__") is not True
+                        ],
+                    )
+                ]
+            )
+        )
+
+    def get_recorded_event(self, event: recorder.RecordedEvent) -> Group:
+        assert self.recorder is not None
+        code = event.code
+        header = Text.assemble(
+            ("Recorded event ", "bold"),
+            (f"-{self.recorder.count - 1 - event.number}", "magenta"),
+            f" of {len(self.recorder)}",
+        )
+        traceback = Traceback(
+            Trace(
+                stacks=[
+                    Stack(
+                        is_cause=False,
+                        exc_type="",
+                        exc_value="",
+                        frames=[
+                            Frame(
+                                code.co_filename, lineno=event.lineno, name=code.co_name
+                            )
+                        ],
+                    )
+                ]
+            )
+        )
+        values, complete = self.recorder.locals_at(event.number)
+        table = Table(title="Recorded locals", box=box.MINIMAL)
+
+        table.add_column("Variable", style="cyan")
+        table.add_column("Value", style="magenta")
+        changed = dict(event.delta)
+        for variable, value in values.items():
+            if not variable.startswith("__"):
+                table.add_row(
+                    variable, value, style="bold" if variable in changed else None
+                )
+        if not complete:
+            table.caption = "The call of the frame is no longer recorded"
+        return Group(header, traceback, table)
+
+    def get_thread_group(
+        self, number: int, names: list[str], stack: list[tuple[FrameType, int]]
+    ) -> Group:
+        shown_names = ", ".join(names[:5]) + (", ..." if len(names) > 5 else "")
+        header = Text.assemble(
+            (f"[{number}] ", "bold"),
+            (f"{len(names)} thread{'s' if len(names) > 1 else ''}", "magenta"),
+            ": ",
+            (shown_names, "cyan"),
+            " (debugged)" if number == 0 else "",
+        )
+        return Group(header, self.get_stack_traceback(stack))
+
+    def get_watchpoints_table(self) -> Table | str:
+        if not self.watchpoints:
+            return "No watchpoint"
+        table = Table(title="Watchpoints", box=box.MINIMAL)
+
+        table.add_column("Num", justify="right")
+        table.add_column("Expression", style="cyan")
+        table.add_column("Value", style="magenta")
+        table.add_column("Scope", style="green")
+        for watchpoint in self.watchpoints.values():
+            table.add_row(
+                str(watchpoint.number),
+                watchpoint.expression,
+                rpc.safe_repr(watchpoint.value),
+                ", ".join(
+                    f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                    for code in watchpoint.scope
+                )
+                + (" (identity only)" if watchpoint.identity_only else ""),
+            )
+        return table
+
+    def get_watchpoint_changes_table(
+        self, changes: list[tuple[watch.Watchpoint, Any, Any]]
+    ) -> Table:
+        table = Table(title="Watchpoint changed", box=box.MINIMAL)
+
+        table.add_column("Watchpoint", style="cyan")
+        table.add_column("Old value", style="magenta")
+        table.add_column("New value", style="green")
+        for watchpoint, old, new in changes:
+            table.add_row(
+                f"{watchpoint.number}: {watchpoint.expression}",
+                rpc.safe_repr(old),
+                rpc.safe_repr(new),
+            )
+        return table
+
     def get_vars_tree(self) -> Tree | None:
         variables = self.get_variables()
         if not variables:
@@ -620,6 +1585,16 @@ class Piping(_Piping):
                     debugger.console.size = ConsoleDimensions(cols, rows)
                 self.pty.resize(*term_size)
                 return
+            if src_fd == self.client_fd and b"\x03" in data:
+                debugger = RemoteDebugger._get_current_instance()
+                # Ctrl-C interrupts the running command instead of the program
+                if (
+                    isinstance(debugger, RemoteDebugger)
+                    and debugger.interrupt_evaluation()
+                ):
+                    data = data.replace(b"\x03", b"")
+                    if not data:
+                        return
         except OSError:
             data = ""
         if data:
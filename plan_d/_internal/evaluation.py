@@ -0,0 +1,163 @@
+"""
+Bounds of the code evaluated by the debugger commands.
+
+The commands evaluate the code in the debugged thread, an `EvaluationGuard` raises
+an exception into it when the command runs over its timeout or when the client
+interrupts it. The exception is asynchronous: it is raised at the next bytecode run
+by the thread, so a long call into C code, such as `time.sleep`, is only
+interrupted when it returns.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager, suppress
+from typing import Generator
+
+
+DEFAULT_EVALUATION_TIMEOUT = 30.0
+# the results deeper or longer than this are reported instead of rendered
+DEFAULT_RESULT_BUDGET = 10_000_000
+# the results whose deep size is checked before rendering them, their repr renders
+# all the objects they reference
+RENDERED_CONTAINERS = (str, bytes, bytearray, list, tuple, dict, set, frozenset, deque)
+# the time spent measuring a result, bigger results are rendered when under budget
+RESULT_SIZE_TIME_BUDGET = 0.1
+
+# iterations running into the eval breaker, to raise a pending exception
+PENDING_EXCEPTION_LOOPS = 100
+
+
+class EvaluationInterrupted(KeyboardInterrupt):
+    """
+    Raised into a command interrupted by the client.
+
+    Like `KeyboardInterrupt`, it isn't caught by `except Exception` in the
+    evaluated code.
+    """
+
+    def __str__(self) -> str:
+        return "Interrupted"
+
+
+class EvaluationTimeout(EvaluationInterrupted):
+    """
+    Raised into a command running over its timeout.
+    """
+
+    def __str__(self) -> str:
+        return "Interrupted, the command ran over its timeout (see `limits`)"
+
+
+class EvaluationGuard:
+    """
+    Interrupt the command run by a thread at its timeout, or on demand.
+    """
+
+    def __init__(self, timeout: float | None, thread_id: int | None = None) -> None:
+        self.timeout = timeout
+        self.thread_id = thread_id or threading.get_ident()
+        self.active = False
+        self.lock = threading.Lock()
+        self.timer: threading.Timer | None = None
+        self.deadline: float | None = None
+        # whether an exception was sent, it may still be pending
+        self.interrupted = False
+
+    def __enter__(self) -> EvaluationGuard:
+        with self.lock:
+            self.active = True
+            self._start_timer(self.timeout or None)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            self.close()
+        except EvaluationInterrupted:
+            # raised at the very end of the command
+            self.close()
+
+    def close(self) -> None:
+        """
+        End the guarded command, from its thread. This can be done more than once.
+        """
+        with self.lock:
+            self.active = False
+            timer = self.timer
+            self._cancel_timer()
+            interrupted, self.interrupted = self.interrupted, False
+        if timer is not None:
+            # don't leave the thread of the timer to the next commands
+            timer.join()
+        if interrupted:
+            # an exception not raised yet would be raised after the command, it is
+            # raised at the next jump. Clearing it with the C API instead leaves the
+            # eval breaker of CPython 3.11 set, hanging the profilers.
+            with suppress(EvaluationInterrupted):
+                for _ in range(PENDING_EXCEPTION_LOOPS):
+                    pass
+
+    def interrupt(
+        self, exception: type[EvaluationInterrupted] = EvaluationInterrupted
+    ) -> bool:
+        """
+        Raise an exception into the command, return False if it is over.
+        """
+        with self.lock:
+            if not self.active:
+                return False
+            _set_async_exc(self.thread_id, exception)
+            self.interrupted = True
+            return True
+
+    def extend(self, seconds: float) -> None:
+        """
+        Push the timeout back, for a command running as long as the user asked.
+        """
+        with self.lock:
+            remaining = self._cancel_timer()
+            if self.active and remaining is not None:
+                self._start_timer(remaining + seconds)
+
+    @contextmanager
+    def suspended(self) -> Generator[None, None, None]:
+        """
+        Stop the clock of the timeout, while waiting for the client.
+        """
+        with self.lock:
+            remaining = self._cancel_timer()
+        try:
+            yield
+        finally:
+            with self.lock:
+                if self.active:
+                    self._start_timer(remaining)
+
+    def _start_timer(self, timeout: float | None) -> None:
+        if timeout is None:
+            return
+        self.deadline = time.monotonic() + timeout
+        self.timer = threading.Timer(timeout, self.interrupt, (EvaluationTimeout,))
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _cancel_timer(self) -> float | None:
+        """
+        Cancel the timer, return the time which was remaining.
+        """
+        if self.timer is None or self.deadline is None:
+            return None
+        self.timer.cancel()
+        remaining = max(self.deadline - time.monotonic(), 0.0)
+        self.timer = self.deadline = None
+        return remaining
+
+
+def _set_async_exc(thread_id: int, exception: type[BaseException]) -> None:
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exception)
+    )
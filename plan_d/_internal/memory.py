@@ -0,0 +1,181 @@
+"""
+Memory diagnostics: deep sizes of objects and tracemalloc snapshots.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from contextlib import suppress
+from types import BuiltinFunctionType, CodeType, FrameType, FunctionType, ModuleType
+from typing import Any, NamedTuple
+
+
+DEFAULT_MAX_OBJECTS = 100_000
+DEFAULT_TIME_BUDGET = 2.0
+DEFAULT_TOP_LIMIT = 10
+
+# objects shared by the whole program, they don't belong to any variable
+SHARED_TYPES = (
+    type,
+    ModuleType,
+    FunctionType,
+    BuiltinFunctionType,
+    CodeType,
+    FrameType,
+)
+
+# the deadline is checked every `DEADLINE_CHECK_INTERVAL` objects, from the first one
+DEADLINE_CHECK_INTERVAL = 1024
+
+# the snapshots are kept per process, as tracemalloc is, until `mem stop` or a detach
+snapshots: list[tracemalloc.Snapshot] = []
+# a snapshot holds all the traced allocations, they are dropped on demand only
+MAX_SNAPSHOTS = 10
+
+
+class DeepSize(NamedTuple):
+    size: int
+    objects: int
+    complete: bool
+
+
+def deep_sizeof(
+    obj: Any,
+    max_objects: int = DEFAULT_MAX_OBJECTS,
+    deadline: float | None = None,
+) -> DeepSize:
+    """
+    The size of an object and all the objects it references.
+
+    The traversal stops after `max_objects` objects or at the `deadline` (a
+    `time.monotonic()` value), the result is then a lower bound. Classes, modules,
+    functions and frames are shared by the program and never followed.
+    """
+    seen = {id(obj)}
+    pending = [obj]
+    size = objects = 0
+    complete = True
+    while pending:
+        if objects >= max_objects or (
+            deadline is not None
+            # right after the object itself, which is always measured
+            and objects % DEADLINE_CHECK_INTERVAL == 1
+            and time.monotonic() > deadline
+        ):
+            return DeepSize(size, objects, complete=False)
+        item = pending.pop()
+        with suppress(TypeError):
+            size += sys.getsizeof(item)
+        objects += 1
+        referents = gc.get_referents(item)
+        # don't go through the millions of items of a container to stop right after
+        room = max_objects - len(seen)
+        if len(referents) > room:
+            referents = referents[: max(room, 0)]
+            complete = False
+        for referent in referents:
+            if id(referent) not in seen and not isinstance(referent, SHARED_TYPES):
+                seen.add(id(referent))
+                pending.append(referent)
+    return DeepSize(size, objects, complete)
+
+
+def deep_sizes(
+    namespace: dict[str, Any],
+    max_objects: int = DEFAULT_MAX_OBJECTS,
+    time_budget: float = DEFAULT_TIME_BUDGET,
+) -> list[tuple[str, Any, DeepSize]]:
+    """
+    The deep sizes of the values of a namespace, the largest first.
+
+    All the values share the time budget, the values left when it runs out are
+    measured shallowly.
+    """
+    deadline = time.monotonic() + time_budget
+    sizes = [
+        (name, value, deep_sizeof(value, max_objects, deadline))
+        for name, value in namespace.items()
+    ]
+    return sorted(sizes, key=lambda item: item[2].size, reverse=True)
+
+
+def start_tracing(nframes: int = 1) -> bool:
+    """
+    Start tracing allocations, return False if they were already traced.
+    """
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(nframes)
+    return True
+
+
+def stop_tracing() -> None:
+    tracemalloc.stop()
+    snapshots.clear()
+
+
+def add_snapshot() -> int:
+    """
+    Take and keep a snapshot, return its number.
+    """
+    if len(snapshots) >= MAX_SNAPSHOTS:
+        raise RuntimeError(
+            f"{MAX_SNAPSHOTS} snapshots are kept already, drop them with `mem stop`"
+        )
+    snapshots.append(take_snapshot())
+    return len(snapshots)
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """
+    Take a snapshot of the traced allocations, without the ones of tracemalloc
+    and of the debugger.
+    """
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not tracing, run `mem start` first")
+    return tracemalloc.take_snapshot().filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, os.path.join(os.path.dirname(__file__), "*")),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ]
+    )
+
+
+def get_snapshot(number: int) -> tracemalloc.Snapshot:
+    """
+    Return a snapshot by its number, starting from 1.
+    """
+    if not 0 < number <= len(snapshots):
+        raise IndexError(f"No snapshot {number}, {len(snapshots)} taken")
+    return snapshots[number - 1]
+
+
+def top_allocations(
+    snapshot: tracemalloc.Snapshot, limit: int = DEFAULT_TOP_LIMIT
+) -> list[tracemalloc.Statistic]:
+    return snapshot.statistics("lineno")[:limit]
+
+
+def diff_allocations(
+    old: tracemalloc.Snapshot,
+    new: tracemalloc.Snapshot,
+    limit: int = DEFAULT_TOP_LIMIT,
+) -> list[tracemalloc.StatisticDiff]:
+    return [
+        stat
+        for stat in new.compare_to(old, "lineno")
+        if stat.size_diff or stat.count_diff
+    ][:limit]
+
+
+def format_location(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0] if len(traceback) else None
+    return f"{frame.filename}:{frame.lineno}" if frame else "<unknown>"
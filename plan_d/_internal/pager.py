@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from itertools import islice
+from typing import TYPE_CHECKING
+
+from rich.control import Control, ControlType
+from rich.segment import Segment, Segments
+
+
+if TYPE_CHECKING:
+    from typing import Callable, Iterator
+
+    from rich.console import Console, RenderableType
+
+
+PAGER_PROMPT = (
+    "[reverse]--More--[/reverse] [dim](space: page, enter: line, q: quit)[/dim]"
+)
+
+
+class Pager:
+    """
+    Render a renderable page by page.
+
+    The renderable is rendered lazily, the lines of the next page are only
+    produced after the user asked for them, so quitting with `q` also stops
+    the rendering of the rest of the output.
+    """
+
+    def __init__(self, console: Console, read_key: Callable[[], str]) -> None:
+        self.console = console
+        self.read_key = read_key
+
+    def iter_lines(
+        self, renderable: RenderableType | str, soft_wrap: bool = False
+    ) -> Iterator[list[Segment]]:
+        console = self.console
+        if isinstance(renderable, str):
+            renderable = console.render_str(renderable)
+        options = console.options
+        segments = console.render(renderable, options)
+        if soft_wrap:
+            return iter(Segment.split_lines(segments))
+        return iter(
+            Segment.split_and_crop_lines(
+                segments, options.max_width, pad=False, include_new_lines=False
+            )
+        )
+
+    def page(self, renderable: RenderableType | str, soft_wrap: bool = False) -> None:
+        lines = self.iter_lines(renderable, soft_wrap=soft_wrap)
+        # keep the last line of the screen for the prompt
+        page_size = max(1, self.console.height - 1)
+
+        # peek one more line to know if the output fits into one screen
+        chunk = list(islice(lines, page_size + 1))
+        if len(chunk) <= page_size:
+            self._print_lines(chunk)
+            return
+        self._print_lines(chunk[:page_size])
+        pending = chunk[page_size:]
+
+        while True:
+            key = self._prompt()
+            if key in ("q", "Q", "\x03", "\x04", ""):
+                return
+            amount = 1 if key in ("\r", "\n", "j") else page_size
+            chunk = pending + list(islice(lines, amount - len(pending) + 1))
+            self._print_lines(chunk[:amount])
+            pending = chunk[amount:]
+            if not pending:
+                return
+
+    def _prompt(self) -> str:
+        console = self.console
+        console.print(PAGER_PROMPT, end="", no_wrap=True, overflow="crop", crop=True)
+        try:
+            return self.read_key()
+        finally:
+            console.control(
+                Control.move_to_column(0), Control((ControlType.ERASE_IN_LINE, 2))
+            )
+
+    def _print_lines(self, lines: list[list[Segment]]) -> None:
+        if not lines:
+            return
+        segments = [segment for line in lines for segment in (*line, Segment.line())]
+        self.console.print(Segments(segments), end="", soft_wrap=True)
@@ -0,0 +1,173 @@
+"""
+Profiling from a paused process: deterministic with cProfile, and by sampling the
+stacks of the other threads.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+
+if TYPE_CHECKING:
+    from types import FrameType
+    from typing import Iterable
+
+
+DEFAULT_PROFILE_LIMIT = 20
+DEFAULT_SAMPLE_DURATION = 1.0
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+PROFILED_FILENAME = "<prof>"
+# the rows of the profiler itself, around the profiled statement
+PROFILER_ROWS = {
+    ("~", 0, "<built-in method builtins.exec>"),
+    ("~", 0, "<method 'disable' of '_lsprof.Profiler' objects>"),
+}
+
+
+class FunctionStats(NamedTuple):
+    function: str
+    calls: str
+    total_time: float
+    cumulative_time: float
+
+
+def profile_statement(
+    statement: str, f_globals: dict[str, Any], f_locals: dict[str, Any]
+) -> pstats.Stats:
+    """
+    Run a statement in a namespace under cProfile.
+
+    The debugger commands run inside its trace function, where the profiling
+    events are not emitted, `sys.call_tracing` lifts that like pdb's `debug`,
+    without the debugger tracing the statement.
+    """
+    # compiled first, a syntax error is reported without profiling anything
+    code = compile(statement, PROFILED_FILENAME, "exec")
+    profiler = cProfile.Profile()
+
+    def run() -> None:
+        trace_function = sys.gettrace()
+        sys.settrace(None)
+        try:
+            # `runctx` execs code objects as well, the stubs only accept sources
+            profiler.runctx(code, f_globals, f_locals)  # type: ignore[arg-type]
+        finally:
+            sys.settrace(trace_function)
+
+    sys.call_tracing(run, ())
+    return pstats.Stats(profiler)
+
+
+def hottest_functions(
+    stats: pstats.Stats, limit: int = DEFAULT_PROFILE_LIMIT
+) -> list[FunctionStats]:
+    """
+    The functions which spent the most time themselves, hottest first.
+
+    The rows of the profiler and of the statement's `<module>` are left out.
+    """
+    rows = []
+    for (filename, lineno, name), (
+        primitive_calls,
+        calls,
+        total_time,
+        cumulative_time,
+        _,
+    ) in stats.stats.items():  # type: ignore[attr-defined]
+        if (filename, lineno, name) in PROFILER_ROWS or filename == PROFILED_FILENAME:
+            continue
+        function = name if filename == "~" else f"{name} ({filename}:{lineno})"
+        rows.append(
+            FunctionStats(
+                function,
+                str(calls)
+                if calls == primitive_calls
+                else f"{calls}/{primitive_calls}",
+                total_time,
+                cumulative_time,
+            )
+        )
+    rows.sort(key=lambda row: (row.total_time, row.cumulative_time), reverse=True)
+    return rows[:limit]
+
+
+class SampleNode:
+    """
+    A function in the sampled stacks, with the number of samples it was in.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.count = 0
+        self.children: dict[str, SampleNode] = {}
+
+    def add(self, stack: Iterable[str]) -> None:
+        node = self
+        node.count += 1
+        for name in stack:
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = SampleNode(name)
+            child.count += 1
+            node = child
+
+    def sorted_children(self) -> list[SampleNode]:
+        return sorted(self.children.values(), key=lambda node: node.count, reverse=True)
+
+
+def sample_stacks(
+    duration: float = DEFAULT_SAMPLE_DURATION,
+    interval: float = DEFAULT_SAMPLE_INTERVAL,
+    exclude_threads: Iterable[int] = (),
+    exclude_paths: Iterable[str] = (),
+) -> SampleNode:
+    """
+    Sample the stacks of the running threads, except the current one.
+
+    The threads in `exclude_threads`, or with a frame in `exclude_paths`, are not
+    sampled.
+    """
+    excluded = {threading.get_ident(), *exclude_threads}
+    paths = tuple(os.path.join(path, "") for path in exclude_paths)
+    root = SampleNode("all threads")
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        _sample_once(root, excluded, paths)
+        time.sleep(interval)
+    return root
+
+
+def _sample_once(root: SampleNode, excluded: set[int], paths: tuple[str, ...]) -> None:
+    for ident, frame in sys._current_frames().items():
+        if ident in excluded:
+            continue
+        stack = _get_stack(frame)
+        if paths and any(filename.startswith(paths) for filename, _ in stack):
+            continue
+        root.add(name for _, name in stack)
+
+
+def _get_stack(frame: FrameType | None) -> list[tuple[str, str]]:
+    """
+    The (filename, description) of the functions in a stack, outermost first.
+    """
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(
+            (
+                code.co_filename,
+                f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})",
+            )
+        )
+        frame = frame.f_back
+    stack.reverse()
+    return stack
@@ -0,0 +1,210 @@
+"""
+Recording of the execution of a frame, to inspect the states before a stop.
+
+The `Recorder` logs the line events of a frame and of the frames it calls, with the
+local variables rebound since the previous event of the same frame. Events are
+kept in a ring buffer of fixed-size arrays, and the recorded values are reprs cut
+at `MAX_VALUE_REPR` characters, so the memory is bounded by the capacity whatever
+the program does.
+"""
+
+from __future__ import annotations
+
+import reprlib
+
+from array import array
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+
+if TYPE_CHECKING:
+    from types import CodeType, FrameType
+
+
+DEFAULT_CAPACITY = 10_000
+
+# bounds of the local variables recorded at each event
+MAX_DELTA_VARIABLES = 16
+MAX_VALUE_REPR = 80
+
+CALL, LINE, RETURN = range(3)
+EVENT_KINDS = {"call": CALL, "line": LINE, "return": RETURN}
+
+_MISSING = object()
+
+
+class RecordedEvent(NamedTuple):
+    number: int
+    kind: int
+    code: CodeType
+    lineno: int
+    depth: int
+    frame_serial: int
+    delta: tuple[tuple[str, str], ...]
+
+
+class _FrameState:
+    __slots__ = ("depth", "serial", "values")
+
+    def __init__(self, serial: int, depth: int) -> None:
+        self.serial = serial
+        self.depth = depth
+        self.values: dict[str, Any] = {}
+
+
+class Recorder:
+    def __init__(self, frame: FrameType, capacity: int = DEFAULT_CAPACITY) -> None:
+        if capacity < 1:
+            raise ValueError(
+                f"The capacity of a recording must be positive: {capacity}"
+            )
+        self.capacity = capacity
+        self.kinds = array("b", bytes(capacity))
+        self.code_indexes = array("l", [0]) * capacity
+        self.linenos = array("l", [0]) * capacity
+        self.depths = array("l", [0]) * capacity
+        self.frame_serials = array("q", [0]) * capacity
+        self.deltas: list[tuple[tuple[str, str], ...]] = [()] * capacity
+        self.codes: list[CodeType] = []
+        self.code_indexes_by_code: dict[CodeType, int] = {}
+        # the number of events recorded so far, the last `capacity` ones are kept
+        self.count = 0
+        self.active = True
+        self.frames: dict[int, _FrameState] = {}
+        self.next_serial = 0
+        self.repr = reprlib.Repr()
+        self.repr.maxstring = self.repr.maxother = MAX_VALUE_REPR
+        self.repr.maxlevel = 2
+        self._add_frame(frame, 0)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def first(self) -> int:
+        """
+        The number of the oldest event still in the buffer.
+        """
+        return self.count - len(self)
+
+    def is_recorded(self, frame: FrameType) -> bool:
+        return id(frame) in self.frames
+
+    def record(self, frame: FrameType, event: str) -> None:
+        kind = EVENT_KINDS.get(event)
+        if kind is None:
+            return
+        state = self.frames.get(id(frame))
+        if state is None:
+            parent = self.frames.get(id(frame.f_back))
+            if kind != CALL or parent is None:
+                return
+            state = self._add_frame(frame, parent.depth + 1)
+
+        code = frame.f_code
+        code_index = self.code_indexes_by_code.get(code)
+        if code_index is None:
+            code_index = self.code_indexes_by_code[code] = len(self.codes)
+            self.codes.append(code)
+        position = self.count % self.capacity
+        self.kinds[position] = kind
+        self.code_indexes[position] = code_index
+        self.linenos[position] = frame.f_lineno
+        self.depths[position] = state.depth
+        self.frame_serials[position] = state.serial
+        self.deltas[position] = () if kind == RETURN else self._delta(frame, state)
+        self.count += 1
+
+        if kind == RETURN:
+            del self.frames[id(frame)]
+            if not self.frames:
+                # the recorded frame returned
+                self.active = False
+
+    def stop(self) -> None:
+        self.active = False
+        self.frames.clear()
+
+    def event(self, number: int) -> RecordedEvent:
+        if not self.first <= number < self.count:
+            raise IndexError(f"Event {number} is not recorded")
+        position = number % self.capacity
+        return RecordedEvent(
+            number,
+            self.kinds[position],
+            self.codes[self.code_indexes[position]],
+            self.linenos[position],
+            self.depths[position],
+            self.frame_serials[position],
+            self.deltas[position],
+        )
+
+    def previous_line(
+        self, number: int, max_depth: int | None = None
+    ) -> RecordedEvent | None:
+        """
+        The last line event before an event, not deeper than `max_depth`.
+        """
+        for previous in range(number - 1, self.first - 1, -1):
+            event = self.event(previous)
+            if event.kind == LINE and (max_depth is None or event.depth <= max_depth):
+                return event
+        return None
+
+    def next_line(
+        self, number: int, max_depth: int | None = None
+    ) -> RecordedEvent | None:
+        """
+        The first line event after an event, not deeper than `max_depth`.
+        """
+        for following in range(number + 1, self.count):
+            event = self.event(following)
+            if event.kind == LINE and (max_depth is None or event.depth <= max_depth):
+                return event
+        return None
+
+    def locals_at(self, number: int) -> tuple[dict[str, str], bool]:
+        """
+        The reprs of the local variables of the frame of an event, at this event.
+
+        Return them with whether they are complete, they are not when the call of
+        the frame is no longer in the buffer.
+        """
+        serial = self.event(number).frame_serial
+        values: dict[str, str] = {}
+        # the first event of a frame has all its variables
+        complete = serial == 0 and self.first == 0
+        for previous in range(self.first, number + 1):
+            event = self.event(previous)
+            if event.frame_serial == serial:
+                complete = complete or event.kind == CALL
+                values.update(event.delta)
+        return values, complete
+
+    def _add_frame(self, frame: FrameType, depth: int) -> _FrameState:
+        state = self.frames[id(frame)] = _FrameState(self.next_serial, depth)
+        self.next_serial += 1
+        return state
+
+    def _delta(
+        self, frame: FrameType, state: _FrameState
+    ) -> tuple[tuple[str, str], ...]:
+        values = state.values
+        delta: list[tuple[str, str]] = []
+        for name, value in frame.f_locals.items():
+            if values.get(name, _MISSING) is not value:
+                # the variables over the limit are recorded at the next events
+                if len(delta) == MAX_DELTA_VARIABLES:
+                    break
+                values[name] = value
+                delta.append((name, self._repr(value)))
+        return tuple(delta)
+
+    def _repr(self, value: Any) -> str:
+        try:
+            text = self.repr.repr(value)
+        except Exception as e:
+            return f"<repr error: {type(e).__qualname__}>"
+        # the items of the containers are bounded by count, not by length
+        if len(text) > MAX_VALUE_REPR:
+            text = text[: MAX_VALUE_REPR - 3] + "..."
+        return text
@@ -0,0 +1,610 @@
+"""
+Render rich outputs on the client side.
+
+Instead of rendering the rich renderables with the server side `Console`, the
+debugger sends a compact description of them, wrapped in an APC escape sequence
+so that it travels through the PTY along with the rest of the output. The client
+picks these sequences out of the stream and renders them with rich locally.
+"""
+
+from __future__ import annotations
+
+import base64
+import dataclasses
+import inspect
+import io
+import json
+import linecache
+import os
+import zlib
+
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Any, cast
+
+from madbg.communication import Piping
+from rich import box
+from rich.console import Console, ConsoleDimensions, Group
+from rich.padding import Padding
+from rich.panel import Panel
+from rich.syntax import Syntax
+from rich.table import Table
+from rich.text import Text
+from rich.theme import Theme
+from rich.traceback import Frame, Stack, Trace, Traceback
+from rich.tree import Tree
+
+from . import utils
+from .pager import Pager
+
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+    from rich.console import RenderableType
+
+
+APC_START = b"\x1b_plan-d;"
+APC_END = b"\x1b\\"
+
+CONSOLE_THEME = Theme({"info": "dim cyan", "warning": "magenta", "danger": "bold red"})
+
+PRINT_KWARGS = {"end", "sep", "style", "soft_wrap", "highlight", "markup", "emoji"}
+
+# shown instead of an output the client failed to decode or render
+RENDER_ERROR_NOTICE = "[danger]plan-d: an output couldn't be rendered on the client[/]"
+
+
+class UnsupportedRenderableError(Exception):
+    pass
+
+
+def dump_message(
+    objects: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    syntax_theme: str | None = None,
+    pager: bool = False,
+) -> dict[str, Any] | None:
+    """
+    Describe a `Console.print` call, return None if it can't be rendered remotely.
+    """
+    if not set(kwargs) <= PRINT_KWARGS or not all(
+        value is None or isinstance(value, (str, bool)) for value in kwargs.values()
+    ):
+        return None
+    try:
+        return {
+            "objects": [dump_renderable(obj, syntax_theme) for obj in objects],
+            "kwargs": kwargs,
+            "pager": pager,
+        }
+    except UnsupportedRenderableError:
+        return None
+
+
+def dump_renderable(obj: Any, syntax_theme: str | None = None) -> Any:
+    if obj is None or isinstance(obj, str):
+        return obj
+    if isinstance(obj, Text):
+        return {
+            "type": "text",
+            "markup": obj.markup,
+            "style": str(obj.style),
+            "justify": obj.justify,
+            "overflow": obj.overflow,
+            "no_wrap": obj.no_wrap,
+            "end": obj.end,
+        }
+    if isinstance(obj, Table):
+        return _dump_table(obj, syntax_theme)
+    if isinstance(obj, Tree):
+        return {
+            "type": "tree",
+            "label": dump_renderable(obj.label, syntax_theme),
+            "style": str(obj.style),
+            "guide_style": str(obj.guide_style),
+            "expanded": obj.expanded,
+            "hide_root": obj.hide_root,
+            "children": [
+                dump_renderable(child, syntax_theme) for child in obj.children
+            ],
+        }
+    if isinstance(obj, Panel):
+        return {
+            "type": "panel",
+            "renderable": dump_renderable(obj.renderable, syntax_theme),
+            "box": _box_name(obj.box),
+            "title": dump_renderable(obj.title, syntax_theme),
+            "subtitle": dump_renderable(obj.subtitle, syntax_theme),
+            "expand": obj.expand,
+            "style": str(obj.style),
+            "border_style": str(obj.border_style),
+            "padding": Padding.unpack(obj.padding),
+        }
+    if isinstance(obj, Group):
+        return {
+            "type": "group",
+            "renderables": [
+                dump_renderable(renderable, syntax_theme)
+                for renderable in obj.renderables
+            ],
+        }
+    if isinstance(obj, Syntax):
+        return _dump_syntax(obj, syntax_theme)
+    if isinstance(obj, Traceback):
+        return _dump_traceback(obj)
+    raise UnsupportedRenderableError(type(obj).__qualname__)
+
+
+def load_renderable(data: Any, syntax_theme: str | None = None) -> Any:
+    if data is None or isinstance(data, str):
+        return data
+    kind = data.pop("type")
+    if kind == "text":
+        no_wrap = data.pop("no_wrap")
+        text = Text.from_markup(data.pop("markup"), **data)
+        text.no_wrap = no_wrap
+        return text
+    if kind == "table":
+        return _load_table(data, syntax_theme)
+    if kind == "tree":
+        children = data.pop("children")
+        tree = Tree(load_renderable(data.pop("label"), syntax_theme), **data)
+        tree.children = [load_renderable(child, syntax_theme) for child in children]
+        return tree
+    if kind == "panel":
+        return Panel(
+            load_renderable(data.pop("renderable"), syntax_theme),
+            box=getattr(box, data.pop("box")),
+            title=load_renderable(data.pop("title"), syntax_theme),
+            subtitle=load_renderable(data.pop("subtitle"), syntax_theme),
+            padding=tuple(data.pop("padding")),
+            **data,
+        )
+    if kind == "group":
+        return Group(
+            *[
+                load_renderable(renderable, syntax_theme)
+                for renderable in data["renderables"]
+            ]
+        )
+    if kind == "syntax":
+        highlight_lines = set(data.pop("highlight_lines") or ())
+        return Syntax(
+            data.pop("code"),
+            data.pop("lexer"),
+            theme=data.pop("theme") or syntax_theme or "ansi_dark",
+            highlight_lines=highlight_lines,
+            **data,
+        )
+    if kind == "traceback":
+        return _load_traceback(data)
+    raise UnsupportedRenderableError(kind)
+
+
+def encode_message(message: dict[str, Any]) -> str:
+    payload = base64.b64encode(zlib.compress(json.dumps(message).encode()))
+    return (APC_START + payload + APC_END).decode()
+
+
+def decode_message(payload: bytes) -> dict[str, Any]:
+    return json.loads(zlib.decompress(base64.b64decode(payload)))
+
+
+class MessageStreamDecoder:
+    """
+    Split the server output into raw bytes and rich messages.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self._in_message = False
+
+    def feed(self, data: bytes) -> Iterator[bytes | dict[str, Any]]:
+        buffer = self._buffer + data
+        while buffer:
+            if self._in_message:
+                end = buffer.find(APC_END)
+                if end < 0:
+                    break
+                try:
+                    message = decode_message(buffer[:end])
+                except (ValueError, zlib.error):
+                    # a corrupted message doesn't stop the stream after it
+                    message = {
+                        "objects": [RENDER_ERROR_NOTICE],
+                        "kwargs": {},
+                        "pager": False,
+                    }
+                yield message
+                buffer = buffer[end + len(APC_END) :]
+                self._in_message = False
+                continue
+
+            start = buffer.find(APC_START)
+            if start >= 0:
+                if start:
+                    yield buffer[:start]
+                buffer = buffer[start + len(APC_START) :]
+                self._in_message = True
+                continue
+
+            # hold back a possibly incomplete start sequence
+            keep = next(
+                (
+                    size
+                    for size in range(min(len(APC_START) - 1, len(buffer)), 0, -1)
+                    if buffer.endswith(APC_START[:size])
+                ),
+                0,
+            )
+            if len(buffer) > keep:
+                yield buffer[: len(buffer) - keep]
+            buffer = buffer[len(buffer) - keep :]
+            break
+        self._buffer = buffer
+
+
+class RawTerminalWriter(io.TextIOBase):
+    """
+    Write text to a terminal in raw mode, where `\\n` doesn't return the carriage.
+    """
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+
+    def write(self, data: str) -> int:
+        encoded = data.replace("\n", "\r\n").encode()
+        while encoded:
+            encoded = encoded[os.write(self.fd, encoded) :]
+        return len(data)
+
+    def isatty(self) -> bool:
+        return True
+
+
+class ClientRenderer:
+    def __init__(self, in_fd: int, out_fd: int) -> None:
+        self.in_fd = in_fd
+        self.console = Console(
+            file=cast(IO[str], RawTerminalWriter(out_fd)),
+            force_terminal=True,
+            force_interactive=True,
+            tab_size=4,
+            theme=CONSOLE_THEME,
+        )
+
+    def render(self, message: dict[str, Any]) -> None:
+        term_size = utils.get_terminal_size()
+        self.console.size = ConsoleDimensions(term_size.columns, term_size.lines)
+        objects = [load_renderable(obj) for obj in message["objects"]]
+        kwargs = message["kwargs"]
+        with _linecache_sources(objects):
+            if message["pager"] and len(objects) == 1 and set(kwargs) <= {"soft_wrap"}:
+                Pager(self.console, self.read_key).page(objects[0], **kwargs)
+            else:
+                self.console.print(*objects, **kwargs)
+
+    def read_key(self) -> str:
+        return os.read(self.in_fd, 1).decode(errors="ignore")
+
+
+class ClientPiping(Piping):
+    """
+    A client side piping rendering the rich messages sent by the server.
+    """
+
+    def __init__(self, pipe_dict: dict[int, set[int]], server_fd: int, in_fd: int):
+        super().__init__(pipe_dict)
+        self.server_fd = server_fd
+        self.decoder = MessageStreamDecoder()
+        self.renderers: dict[int, ClientRenderer] = {}
+        self.in_fd = in_fd
+
+    def _read(self, src_fd, dest_fds):
+        if src_fd != self.server_fd:
+            return super()._read(src_fd, dest_fds)
+        try:
+            data = os.read(src_fd, 1024)
+        except OSError:
+            data = b""
+        if not data:
+            return super()._read(src_fd, dest_fds)
+
+        for part in self.decoder.feed(data):
+            for dest_fd in dest_fds:
+                if isinstance(part, bytes):
+                    self.buffers[dest_fd] += part
+                    continue
+                self._flush(dest_fd)
+                if dest_fd not in self.renderers:
+                    self.renderers[dest_fd] = ClientRenderer(self.in_fd, dest_fd)
+                renderer = self.renderers[dest_fd]
+                try:
+                    renderer.render(part)
+                except Exception:
+                    # e.g. from a server of another version, go on with the session
+                    renderer.console.print(RENDER_ERROR_NOTICE)
+
+    def _flush(self, dest_fd: int) -> None:
+        while self.buffers[dest_fd]:
+            self._write(dest_fd)
+
+
+def _box_name(value: box.Box | None) -> str | None:
+    if value is None:
+        return None
+    for name, candidate in vars(box).items():
+        if candidate is value:
+            return name
+    raise UnsupportedRenderableError("custom box")
+
+
+def _dump_table(table: Table, syntax_theme: str | None) -> dict[str, Any]:
+    columns = []
+    for column in table.columns:
+        columns.append(
+            {
+                "header": dump_renderable(column.header, syntax_theme),
+                "footer": dump_renderable(column.footer, syntax_theme),
+                "header_style": str(column.header_style),
+                "footer_style": str(column.footer_style),
+                "style": str(column.style),
+                "justify": column.justify,
+                "vertical": column.vertical,
+                "overflow": column.overflow,
+                "width": column.width,
+                "min_width": column.min_width,
+                "max_width": column.max_width,
+                "ratio": column.ratio,
+                "no_wrap": column.no_wrap,
+                "cells": [
+                    dump_renderable(cell, syntax_theme) for cell in column._cells
+                ],
+            }
+        )
+    return {
+        "type": "table",
+        "columns": columns,
+        "rows": [
+            {
+                "style": None if row.style is None else str(row.style),
+                "end_section": row.end_section,
+            }
+            for row in table.rows
+        ],
+        "title": dump_renderable(table.title, syntax_theme),
+        "caption": dump_renderable(table.caption, syntax_theme),
+        "box": _box_name(table.box),
+        "width": table.width,
+        "min_width": table.min_width,
+        "padding": table.padding,
+        "collapse_padding": table.collapse_padding,
+        "pad_edge": table.pad_edge,
+        "expand": table.expand,
+        "show_header": table.show_header,
+        "show_footer": table.show_footer,
+        "show_edge": table.show_edge,
+        "show_lines": table.show_lines,
+        "leading": table.leading,
+        "style": str(table.style),
+        "header_style": str(table.header_style),
+        "border_style": None if table.border_style is None else str(table.border_style),
+        "title_style": None if table.title_style is None else str(table.title_style),
+        "title_justify": table.title_justify,
+    }
+
+
+def _load_table(data: dict[str, Any], syntax_theme: str | None) -> Table:
+    columns = data.pop("columns")
+    rows = data.pop("rows")
+    table = Table(
+        title=load_renderable(data.pop("title"), syntax_theme),
+        caption=load_renderable(data.pop("caption"), syntax_theme),
+        box=None if data["box"] is None else getattr(box, data.pop("box")),
+        padding=tuple(data.pop("padding")),
+        **{key: value for key, value in data.items() if key != "box"},
+    )
+    cells = []
+    for column in columns:
+        column_cells = column.pop("cells")
+        table.add_column(
+            load_renderable(column.pop("header"), syntax_theme),
+            load_renderable(column.pop("footer"), syntax_theme),
+            **column,
+        )
+        cells.append([load_renderable(cell, syntax_theme) for cell in column_cells])
+    for index, row in enumerate(rows):
+        table.add_row(*[column_cells[index] for column_cells in cells], **row)
+    return table
+
+
+def _dump_syntax(syntax: Syntax, syntax_theme: str | None) -> dict[str, Any]:
+    lexer = syntax._lexer
+    if not isinstance(lexer, str):
+        lexer = lexer.aliases[0] if lexer.aliases else "text"
+
+    # only send the lines to display, the other lines are kept empty so that
+    # the line numbers are rendered the same
+    code = syntax.code
+    if syntax.line_range is not None:
+        first, last = syntax.line_range
+        lines = code.splitlines(keepends=True)
+        first_index = max((first or syntax.start_line) - syntax.start_line, 0)
+        last_index = (
+            len(lines) if last is None else max(last - syntax.start_line + 1, 0)
+        )
+        code = "".join(
+            line if first_index <= index < last_index else "\n"
+            for index, line in enumerate(lines)
+        )
+
+    return {
+        "type": "syntax",
+        "code": code,
+        "lexer": lexer,
+        "theme": syntax_theme,
+        "dedent": syntax.dedent,
+        "line_numbers": syntax.line_numbers,
+        "start_line": syntax.start_line,
+        "line_range": syntax.line_range,
+        "highlight_lines": sorted(syntax.highlight_lines),
+        "code_width": syntax.code_width,
+        "tab_size": syntax.tab_size,
+        "word_wrap": syntax.word_wrap,
+        "indent_guides": syntax.indent_guides,
+    }
+
+
+def _dump_traceback(traceback: Traceback) -> dict[str, Any]:
+    sources: dict[str, dict[str, Any]] = {}
+
+    def dump_trace(trace: Trace) -> dict[str, Any]:
+        stacks = []
+        for stack in trace.stacks:
+            if getattr(stack, "syntax_error", None) is not None:
+                raise UnsupportedRenderableError("syntax error stack")
+            frames = []
+            for frame in stack.frames:
+                if frame.locals:
+                    raise UnsupportedRenderableError("traceback with locals")
+                frames.append(dataclasses.asdict(frame))
+                # ship the code around each frame, the client can't read the files
+                if frame.filename not in sources:
+                    sources[frame.filename] = {
+                        "count": len(linecache.getlines(frame.filename)),
+                        "lines": {},
+                    }
+                lines = sources[frame.filename]["lines"]
+                for lineno in range(
+                    max(frame.lineno - traceback.extra_lines, 1),
+                    frame.lineno + traceback.extra_lines + 1,
+                ):
+                    line = linecache.getline(frame.filename, lineno)
+                    if line:
+                        lines[lineno] = line
+            stacks.append(
+                {
+                    **{
+                        field.name: getattr(stack, field.name)
+                        for field in dataclasses.fields(stack)
+                        if field.name not in ("frames", "exceptions", "syntax_error")
+                    },
+                    "frames": frames,
+                    "exceptions": [
+                        dump_trace(exception)
+                        for exception in getattr(stack, "exceptions", ())
+                    ],
+                }
+            )
+        return {"stacks": stacks}
+
+    return {
+        "type": "traceback",
+        "trace": dump_trace(traceback.trace),
+        "sources": sources,
+        "options": {
+            "width": traceback.width,
+            "extra_lines": traceback.extra_lines,
+            "word_wrap": traceback.word_wrap,
+            "indent_guides": traceback.indent_guides,
+            "max_frames": traceback.max_frames,
+            "suppress": traceback.suppress,
+        },
+    }
+
+
+def _load_traceback(data: dict[str, Any]) -> Traceback:
+    stack_fields = {field.name for field in dataclasses.fields(Stack)}
+
+    def load_trace(trace: dict[str, Any]) -> Trace:
+        stacks = []
+        for stack in trace["stacks"]:
+            stack["frames"] = [
+                Frame(
+                    **{
+                        **frame,
+                        "last_instruction": frame.get("last_instruction")
+                        and tuple(map(tuple, frame["last_instruction"])),
+                    }
+                )
+                for frame in stack["frames"]
+            ]
+            stack["exceptions"] = [load_trace(exc) for exc in stack["exceptions"]]
+            stacks.append(
+                Stack(
+                    **{
+                        key: value
+                        for key, value in stack.items()
+                        if key in stack_fields
+                    }
+                )
+            )
+        return Trace(stacks=stacks)
+
+    parameters = inspect.signature(Traceback).parameters
+    options = {
+        key: value for key, value in data["options"].items() if key in parameters
+    }
+    suppress = options.pop("suppress", [])
+    traceback = Traceback(load_trace(data["trace"]), **options)
+    # the suppressed paths are the server side paths already
+    traceback.suppress = suppress
+    traceback.sources = {  # type: ignore[attr-defined]
+        filename: (
+            source["count"],
+            {int(lineno): line for lineno, line in source["lines"].items()},
+        )
+        for filename, source in data["sources"].items()
+    }
+    return traceback
+
+
+@contextmanager
+def _linecache_sources(objects: list[RenderableType]):
+    """
+    Temporarily make the code sent along with the tracebacks visible to rich.
+
+    The files not sent are made empty, not to show the lines of a local file at
+    the same path.
+    """
+    sources: dict[str, tuple[int, dict[int, str]]] = {}
+    for obj in objects:
+        for nested in _iter_renderables(obj):
+            for filename, (count, lines) in getattr(nested, "sources", {}).items():
+                known_count, known_lines = sources.setdefault(filename, (count, {}))
+                sources[filename] = (max(known_count, count), {**known_lines, **lines})
+    saved = {filename: linecache.cache.get(filename) for filename in sources}
+    for filename, (count, lines) in sources.items():
+        code_lines = [lines.get(lineno, "\n") for lineno in range(1, count + 1)]
+        linecache.cache[filename] = (0, None, code_lines, filename)
+    try:
+        yield
+    finally:
+        for filename, entry in saved.items():
+            if entry is None:
+                linecache.cache.pop(filename, None)
+            else:
+                linecache.cache[filename] = entry
+
+
+def _iter_renderables(obj: Any) -> Iterator[Any]:
+    """
+    The renderable and the renderables nested in it.
+    """
+    yield obj
+    if isinstance(obj, Group):
+        children: list[Any] = list(obj.renderables)
+    elif isinstance(obj, Panel):
+        children = [obj.renderable, obj.title, obj.subtitle]
+    elif isinstance(obj, Table):
+        children = [
+            cell
+            for column in obj.columns
+            for cell in (column.header, column.footer, *column._cells)
+        ]
+    elif isinstance(obj, Tree):
+        children = [obj.label, *obj.children]
+    else:
+        return
+    for child in children:
+        yield from _iter_renderables(child)
@@ -0,0 +1,463 @@
+"""
+A JSON-RPC 2.0 protocol mode for programmatic debugging sessions.
+
+The client opens the session with ``{"mode": "jsonrpc"}`` instead of the terminal
+data, then both sides exchange newline delimited JSON messages. The server sends a
+``stopped`` notification every time the debuggee pauses, and answers requests
+until a resuming method (``step``, ``next``, ``return``, ``continue``, ``detach``)
+is called. ``detach``, or ``continue`` without any breakpoint, ends the session.
+Neither prompt_toolkit nor rich are involved.
+"""
+
+from __future__ import annotations
+
+import bdb
+import json
+import linecache
+import reprlib
+import sys
+import traceback as traceback_module
+
+from collections import deque
+from contextlib import ExitStack
+from inspect import currentframe
+from typing import TYPE_CHECKING, Any
+
+from madbg import client as madbg_client
+from madbg.communication import send_message
+
+
+if TYPE_CHECKING:
+    import socket
+
+    from types import FrameType, TracebackType
+    from typing import Callable, Iterable
+
+
+JSONRPC_MODE = "jsonrpc"
+
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+DEFAULT_MAX_ITEMS = 100
+DEFAULT_MAX_REPR = 200
+
+
+class RpcError(Exception):
+    def __init__(self, message: str, code: int = SERVER_ERROR, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class JsonLineStream:
+    """
+    Newline delimited JSON messages over a socket.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def send(self, message: dict[str, Any]) -> None:
+        self.sock.sendall(json.dumps(message, default=str).encode() + b"\n")
+
+    def receive(self) -> dict[str, Any]:
+        line = self.reader.readline()
+        if not line:
+            raise EOFError("connection closed")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self.reader.close()
+
+
+def safe_repr(value: Any, max_repr: int = DEFAULT_MAX_REPR) -> str:
+    limited = reprlib.Repr()
+    limited.maxstring = limited.maxother = max_repr
+    try:
+        text = limited.repr(value)
+    except Exception as e:
+        return f"<repr failed: {type(e).__qualname__}: {e}>"
+    if len(text) > max_repr:
+        text = text[: max(max_repr - 3, 0)] + "..."
+    return text
+
+
+def describe_value(value: Any, max_repr: int = DEFAULT_MAX_REPR) -> dict[str, Any]:
+    return {"type": type(value).__qualname__, "repr": safe_repr(value, max_repr)}
+
+
+class RpcDebugger(bdb.Bdb):
+    resume_methods = frozenset({"step", "next", "return", "continue", "detach"})
+    stream_class: type[JsonLineStream] = JsonLineStream
+
+    def __init__(self, sock: socket.socket, skip: Iterable[str] | None = None):
+        super().__init__(skip=skip)
+        self.stream = self.stream_class(sock)
+        self.done_callback: Callable[[], None] | None = None
+        self.stack: list[tuple[FrameType, int]] = []
+        self.curindex = 0
+        self.frame_locals: dict[int, dict[str, Any]] = {}
+        self.detaching = False
+
+    # =========== session ===========
+
+    def set_trace(self, frame=None, done_callback=None):
+        if done_callback is not None:
+            self.done_callback = done_callback
+        if frame is None:
+            frame = currentframe().f_back  # type: ignore[union-attr]
+        return super().set_trace(frame)
+
+    def post_mortem(self, traceback: TracebackType | None) -> None:
+        self.reset()
+        self.interaction(None, traceback, "exception")
+
+    def trace_dispatch(self, frame, event, arg):
+        bdb_quit = False
+        try:
+            return super().trace_dispatch(frame, event, arg)
+        except bdb.BdbQuit:
+            bdb_quit = True
+        finally:
+            if self.quitting or bdb_quit:
+                self._on_done()
+
+    def _on_done(self) -> None:
+        if self.done_callback is not None:
+            self.done_callback()
+            self.done_callback = None
+
+    def user_call(self, frame, argument_list):
+        if self.stop_here(frame):
+            self.interaction(frame, None, "call")
+
+    def user_line(self, frame):
+        self.interaction(frame, None, "step" if self.stop_here(frame) else "breakpoint")
+
+    def user_return(self, frame, return_value):
+        self.interaction(frame, None, "return", return_value=return_value)
+
+    def user_exception(self, frame, exc_info):
+        _, exc_value, _ = exc_info
+        self.interaction(frame, None, "exception", exception=exc_value)
+
+    def interaction(
+        self,
+        frame: FrameType | None,
+        traceback: TracebackType | None,
+        reason: str,
+        **details: Any,
+    ) -> None:
+        self.stack, self.curindex = self.get_stack(frame, traceback)
+        self.frame_locals.clear()
+        event: dict[str, Any] = {"reason": reason, "frame": self._describe_frame()}
+        if "return_value" in details:
+            event["return_value"] = describe_value(details["return_value"])
+        if "exception" in details:
+            event["exception"] = describe_value(details["exception"])
+        elif traceback is not None and (exc_value := sys.exc_info()[1]) is not None:
+            event["exception"] = describe_value(exc_value)
+
+        try:
+            self.send_stopped(event)
+            while not self.handle_request(self.stream.receive()):
+                pass
+        except (EOFError, OSError):
+            # the client is gone, let the program go on
+            self.detaching = True
+            self.clear_all_breaks()
+            self.set_continue()
+        finally:
+            self.stack = []
+            self.frame_locals.clear()
+
+        if self.detaching:
+            self.detaching = False
+            self._on_done()
+
+    def send_stopped(self, event: dict[str, Any]) -> None:
+        self.stream.send({"jsonrpc": "2.0", "method": "stopped", "params": event})
+
+    def handle_request(self, request: dict[str, Any]) -> bool:
+        """
+        Answer a request, return True if the debuggee should resume.
+        """
+        method = request.get("method", "")
+        params = request.get("params") or {}
+        response: dict[str, Any] = {"jsonrpc": "2.0", "id": request.get("id")}
+        handler = getattr(self, f"rpc_{method}", None)
+        try:
+            if handler is None:
+                raise RpcError(f"Method {method!r} not found", METHOD_NOT_FOUND)
+            if not isinstance(params, dict):
+                raise RpcError("Params must be an object", INVALID_PARAMS)
+            try:
+                response["result"] = handler(**params)
+            except TypeError as e:
+                raise RpcError(str(e), INVALID_PARAMS) from e
+        except RpcError as e:
+            response["error"] = {"code": e.code, "message": str(e), "data": e.data}
+        except Exception as e:
+            response["error"] = {
+                "code": SERVER_ERROR,
+                "message": f"{type(e).__qualname__}: {e}",
+                "data": {"traceback": traceback_module.format_exc()},
+            }
+        if "id" in request:
+            self.stream.send(response)
+        return method in self.resume_methods and "error" not in response
+
+    # =========== methods ===========
+
+    def rpc_stack(self) -> dict[str, Any]:
+        return {
+            "frames": [self._describe_frame(index) for index in range(len(self.stack))],
+            "current": self.curindex,
+        }
+
+    def rpc_locals(
+        self,
+        frame: int | None = None,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        max_repr: int = DEFAULT_MAX_REPR,
+    ) -> dict[str, Any]:
+        namespace = self._get_locals(frame)
+        names = [name for name in namespace if not name.startswith("__")]
+        return {
+            "variables": [
+                {"name": name, **describe_value(namespace[name], max_repr)}
+                for name in names[:max_items]
+            ],
+            "total": len(names),
+            "truncated": len(names) > max_items,
+        }
+
+    def rpc_evaluate(
+        self,
+        expression: str,
+        frame: int | None = None,
+        max_repr: int = DEFAULT_MAX_REPR,
+    ) -> dict[str, Any]:
+        target = self._get_frame(frame)
+        try:
+            value = eval(expression, target.f_globals, self._get_locals(frame))
+        except Exception as e:
+            raise RpcError(
+                f"{type(e).__qualname__}: {e}",
+                data={"exception": describe_value(e, max_repr)},
+            ) from None
+        return describe_value(value, max_repr)
+
+    def rpc_set_breakpoint(
+        self,
+        filename: str,
+        lineno: int,
+        condition: str | None = None,
+        temporary: bool = False,
+    ) -> dict[str, Any]:
+        filename = self.canonic(filename)
+        if error := self.set_break(filename, lineno, temporary, condition):
+            raise RpcError(error, INVALID_PARAMS)
+        breakpoint = self.get_breaks(filename, lineno)[-1]
+        return {"number": breakpoint.number, "filename": filename, "lineno": lineno}
+
+    def rpc_clear_breakpoint(self, number: int) -> None:
+        if error := self.clear_bpbynumber(number):
+            raise RpcError(error, INVALID_PARAMS)
+
+    def rpc_breakpoints(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "number": breakpoint.number,
+                "filename": breakpoint.file,
+                "lineno": breakpoint.line,
+                "condition": breakpoint.cond,
+                "enabled": breakpoint.enabled,
+                "hits": breakpoint.hits,
+            }
+            for breakpoint in bdb.Breakpoint.bpbynumber
+            if breakpoint is not None
+        ]
+
+    def rpc_step(self) -> None:
+        self.set_step()
+
+    def rpc_next(self) -> None:
+        self.set_next(self._get_frame(None))
+
+    def rpc_return(self) -> None:
+        self.set_return(self._get_frame(None))
+
+    def rpc_continue(self) -> None:
+        if not self.breaks:
+            # nothing can stop the debuggee anymore, end the session
+            self.detaching = True
+        self.set_continue()
+
+    def rpc_detach(self) -> None:
+        self.detaching = True
+        self.clear_all_breaks()
+        self.set_continue()
+
+    # =========== helpers ===========
+
+    def _get_frame(self, index: int | None) -> FrameType:
+        if not self.stack:
+            raise RpcError("No frame is available")
+        if index is None:
+            index = self.curindex
+        if not 0 <= index < len(self.stack):
+            raise RpcError(f"Frame index {index} out of range", INVALID_PARAMS)
+        return self.stack[index][0]
+
+    def _get_locals(self, index: int | None) -> dict[str, Any]:
+        # f_locals creates a new snapshot on every access before python 3.13,
+        # keep the first one so that modifications are visible to later calls
+        frame = self._get_frame(index)
+        if id(frame) not in self.frame_locals:
+            self.frame_locals[id(frame)] = frame.f_locals
+        return self.frame_locals[id(frame)]
+
+    def _describe_frame(self, index: int | None = None) -> dict[str, Any]:
+        index = self.curindex if index is None else index
+        frame, lineno = self.stack[index]
+        filename = frame.f_code.co_filename
+        return {
+            "index": index,
+            "filename": filename,
+            "lineno": lineno,
+            "name": frame.f_code.co_name,
+            "line": linecache.getline(filename, lineno, frame.f_globals).strip(),
+            "hidden": frame.f_locals.get("__tracebackhide__") is True,
+        }
+
+
+class RpcClient:
+    """
+    A client of the JSON-RPC protocol mode.
+
+    .. code-block:: python
+        from plan_d import RpcClient
+
+        with RpcClient.connect("10.0.0.1", 3513) as client:
+            client.wait_for_stop()
+            print(client.stack())
+            print(client.evaluate("len(items)"))
+            client.detach()
+    """
+
+    def __init__(self, sock: socket.socket, exit_stack: ExitStack | None = None):
+        self.sock = sock
+        self.stream = JsonLineStream(sock)
+        self.events: deque[dict[str, Any]] = deque()
+        self._exit_stack = exit_stack or ExitStack()
+        self._next_id = 0
+
+    @classmethod
+    def connect(
+        cls,
+        ip: str,
+        port: int,
+        timeout: float = madbg_client.DEFAULT_CONNECT_TIMEOUT,
+    ) -> RpcClient:
+        exit_stack = ExitStack()
+        sock = exit_stack.enter_context(
+            madbg_client.connect_to_server(ip, port, timeout)
+        )
+        sock.settimeout(None)
+        send_message(sock, {"mode": JSONRPC_MODE})
+        return cls(sock, exit_stack)
+
+    def __enter__(self) -> RpcClient:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.stream.close()
+        self._exit_stack.close()
+
+    def call(self, method: str, **params: Any) -> Any:
+        self._next_id += 1
+        request_id = self._next_id
+        self.stream.send(
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        )
+        while True:
+            message = self.stream.receive()
+            if message.get("id") != request_id:
+                self.events.append(message)
+                continue
+            if error := message.get("error"):
+                raise RpcError(error["message"], error["code"], error.get("data"))
+            return message.get("result")
+
+    def wait_for_stop(self) -> dict[str, Any]:
+        """
+        Wait until the debuggee pauses, and return the `stopped` event params.
+        """
+        while True:
+            message = self.events.popleft() if self.events else self.stream.receive()
+            if message.get("method") == "stopped":
+                return message["params"]
+
+    def stack(self) -> dict[str, Any]:
+        return self.call("stack")
+
+    def locals(
+        self,
+        frame: int | None = None,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        max_repr: int = DEFAULT_MAX_REPR,
+    ) -> dict[str, Any]:
+        return self.call("locals", frame=frame, max_items=max_items, max_repr=max_repr)
+
+    def evaluate(
+        self,
+        expression: str,
+        frame: int | None = None,
+        max_repr: int = DEFAULT_MAX_REPR,
+    ) -> dict[str, Any]:
+        return self.call(
+            "evaluate", expression=expression, frame=frame, max_repr=max_repr
+        )
+
+    def set_breakpoint(
+        self,
+        filename: str,
+        lineno: int,
+        condition: str | None = None,
+        temporary: bool = False,
+    ) -> int:
+        return self.call(
+            "set_breakpoint",
+            filename=filename,
+            lineno=lineno,
+            condition=condition,
+            temporary=temporary,
+        )["number"]
+
+    def clear_breakpoint(self, number: int) -> None:
+        self.call("clear_breakpoint", number=number)
+
+    def breakpoints(self) -> list[dict[str, Any]]:
+        return self.call("breakpoints")
+
+    def step(self) -> None:
+        self.call("step")
+
+    def next(self) -> None:
+        self.call("next")
+
+    def step_out(self) -> None:
+        self.call("return")
+
+    def cont(self) -> None:
+        self.call("continue")
+
+    def detach(self) -> None:
+        self.call("detach")
@@ -0,0 +1,62 @@
+"""
+Snapshots of the stacks of all the threads, the identical ones grouped together.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+
+from typing import TYPE_CHECKING, NamedTuple
+
+
+if TYPE_CHECKING:
+    from types import FrameType
+    from typing import Iterable
+
+
+class ThreadGroup(NamedTuple):
+    names: list[str]
+    # (frame, lineno) outermost first, like the stack of the debugger
+    stack: list[tuple[FrameType, int]]
+
+
+def group_thread_stacks(
+    exclude_threads: Iterable[int] = (),
+    exclude_paths: Iterable[str] = (),
+) -> list[ThreadGroup]:
+    """
+    Snapshot the stacks of the threads, except the current one, and group the
+    identical ones, the largest groups first.
+
+    The threads in `exclude_threads`, or with a frame in `exclude_paths`, are left
+    out.
+    """
+    excluded = {threading.get_ident(), *exclude_threads}
+    paths = tuple(os.path.join(path, "") for path in exclude_paths)
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    groups: dict[tuple[tuple[str, int, str], ...], ThreadGroup] = {}
+    for ident, frame in sys._current_frames().items():
+        if ident in excluded:
+            continue
+        stack = get_stack(frame)
+        if paths and any(f.f_code.co_filename.startswith(paths) for f, _ in stack):
+            continue
+        key = tuple(
+            (f.f_code.co_filename, lineno, f.f_code.co_name) for f, lineno in stack
+        )
+        group = groups.setdefault(key, ThreadGroup([], stack))
+        group.names.append(names.get(ident, f"Thread {ident}"))
+    for group in groups.values():
+        group.names.sort()
+    return sorted(groups.values(), key=lambda group: (-len(group.names), group.names))
+
+
+def get_stack(frame: FrameType | None) -> list[tuple[FrameType, int]]:
+    stack = []
+    while frame is not None:
+        stack.append((frame, frame.f_lineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
@@ -0,0 +1,112 @@
+"""
+Watchpoints: stop when the value of an expression changes.
+
+A watchpoint is only evaluated at the line events of the code objects it was set
+in, the debugger traces these code objects only. A change is detected by identity
+first, then by `==` against a shallow copy of small builtin containers, so that
+mutations are seen too. A watchpoint whose `==` takes longer than its budget falls
+back to identity only.
+"""
+
+from __future__ import annotations
+
+import time
+
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from types import CodeType, FrameType
+
+
+DEFAULT_COMPARE_BUDGET = 0.001
+
+# containers up to this length are copied, to detect their mutations
+MAX_SNAPSHOT_LEN = 1000
+
+SNAPSHOT_TYPES = (list, dict, set, bytearray)
+
+
+class Unavailable:
+    """
+    The value of an expression which can't be evaluated in a frame.
+    """
+
+    def __repr__(self) -> str:
+        return "<unavailable>"
+
+
+UNAVAILABLE = Unavailable()
+
+
+class Watchpoint:
+    def __init__(
+        self,
+        number: int,
+        expression: str,
+        frame: FrameType,
+        compare_budget: float = DEFAULT_COMPARE_BUDGET,
+    ) -> None:
+        self.number = number
+        self.expression = expression
+        self.code = compile(expression, "<watch>", "eval")
+        self.scope: set[CodeType] = {frame.f_code}
+        self.compare_budget = compare_budget
+        self.identity_only = False
+        self.value: Any = UNAVAILABLE
+        self.snapshot: Any = UNAVAILABLE
+        self.reset(frame)
+
+    def evaluate(self, frame: FrameType) -> Any:
+        try:
+            return eval(self.code, frame.f_globals, frame.f_locals)
+        except Exception:
+            return UNAVAILABLE
+
+    def reset(self, frame: FrameType) -> None:
+        """
+        Take the value in a frame as the reference, without comparing it.
+        """
+        if frame.f_code in self.scope:
+            self.value = self.evaluate(frame)
+            self.snapshot = _snapshot(self.value)
+
+    def update(self, frame: FrameType) -> tuple[Any, Any] | None:
+        """
+        Evaluate the expression in a frame, return (old, new) if the value changed.
+
+        Changes from or to an unavailable value only update the reference.
+        """
+        new = self.evaluate(frame)
+        old, snapshot = self.value, self.snapshot
+        if new is UNAVAILABLE or old is UNAVAILABLE:
+            self.value, self.snapshot = new, _snapshot(new)
+            return None
+        if new is old and snapshot is old:
+            return None
+
+        if self.identity_only:
+            equal = new is old
+        else:
+            started = time.perf_counter()
+            try:
+                equal = bool(snapshot == new)
+            except Exception:
+                equal = False
+            if time.perf_counter() - started > self.compare_budget:
+                self.identity_only = True
+
+        self.value = new
+        if equal:
+            # the copy is equal to the new value, no need to copy it again
+            if snapshot is old:
+                self.snapshot = new
+            return None
+        self.snapshot = _snapshot(new)
+        return snapshot, new
+
+
+def _snapshot(value: Any) -> Any:
+    if type(value) in SNAPSHOT_TYPES and len(value) <= MAX_SNAPSHOT_LEN:
+        return value.copy()
+    return value
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import io
+import queue
+import threading
+
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+
+import plan_d
+
+
+HelloMessage = Callable[[str, int], str]
+
+
+class Launcher:
+    """
+    Starts the two sides of the debugging sessions of a test.
+    """
+
+    def __init__(self) -> None:
+        self.threads: list[threading.Thread] = []
+
+    def _start(self, target: Callable[..., Any], *args: Any) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return thread
+
+    def hello_message(self, client: Callable[[int], Any]) -> HelloMessage:
+        """
+        A `hello_message` starting `client` with the port of the session.
+        """
+
+        def hello_message(ip: str, port: int) -> str:
+            self._start(client, port)
+            return f"listening on {ip}:{port}"
+
+        return hello_message
+
+    def run_commands(self, commands: list[str]) -> tuple[HelloMessage, io.BytesIO]:
+        """
+        A `hello_message` running `commands` in the session, and their output.
+
+        The debuggee is left to the test, in the main thread: the PTY of a session
+        needs it.
+        """
+        output = io.BytesIO()
+
+        def client(port: int) -> None:
+            plan_d.run_debugger_commands(
+                "127.0.0.1", port, commands, timeout=10, output=output
+            )
+
+        return self.hello_message(client), output
+
+    def debuggee(self, target: Callable[[HelloMessage], Any]) -> int:
+        """
+        Run `target(hello_message)` in a thread, and return the port of its session.
+        """
+        ports: queue.Queue[int] = queue.Queue()
+
+        def hello_message(ip: str, port: int) -> str:
+            ports.put(port)
+            return f"listening on {ip}:{port}"
+
+        self._start(target, hello_message)
+        return ports.get(timeout=10)
+
+    def join(self) -> None:
+        """
+        Wait for the started threads, and check they are all done.
+        """
+        for thread in self.threads:
+            thread.join(timeout=10)
+        assert not any(thread.is_alive() for thread in self.threads)
+
+
+@pytest.fixture
+def launcher() -> Iterator[Launcher]:
+    launcher = Launcher()
+    yield launcher
+    for thread in launcher.threads:
+        thread.join(timeout=10)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+import textwrap
+
+from pathlib import Path
+
+import pytest
+
+import plan_d
+
+from plan_d._internal.api import inject_set_trace
+
+
+CHILD_CODE = textwrap.dedent(
+    """
+    import time
+
+    def spin():
+        counter = 0
+        print("ready", flush=True)
+        while True:
+            counter += 1
+            time.sleep(0.01)
+
+    spin()
+    """
+)
+
+
+@pytest.fixture
+def child():
+    process = subprocess.Popen(
+        [sys.executable, "-c", CHILD_CODE],
+        cwd=Path(plan_d.__file__).parent.parent,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout.readline() == "ready\n"  # type: ignore[union-attr]
+        yield process
+    finally:
+        process.kill()
+        process.wait()
+
+
+def inject(pid: int) -> int:
+    try:
+        return inject_set_trace(pid)
+    except RuntimeError as e:
+        pytest.skip(f"process injection is not permitted here: {e}")
+
+
+def test_attach(child: subprocess.Popen):
+    for _ in range(2):
+        # the process can be attached to again after a detach
+        port = inject(child.pid)
+        with plan_d.RpcClient.connect("127.0.0.1", port) as client:
+            stopped = client.wait_for_stop()
+            assert stopped["frame"]["name"] == "spin"
+            assert client.evaluate("counter")["repr"].isdigit()
+            client.detach()
+    assert child.poll() is None
+
+
+def test_attach_non_python_process():
+    process = subprocess.Popen(["sleep", "10"])
+    try:
+        with pytest.raises(RuntimeError, match="not running Python"):
+            inject_set_trace(process.pid)
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pytest
+
+from plan_d._internal import benchmark
+
+
+def test_split_statements():
+    assert benchmark.split_statements("sum(data) | sorted(data)|(a | b) | ") == [
+        "sum(data)",
+        "sorted(data)",
+        "(a | b)",
+    ]
+    assert benchmark.split_statements("data[0") == ["data[0"]
+
+
+def test_bench_statement():
+    data = list(range(10_000))
+    namespace = {"data": data, "lookup": set(data)}
+    in_list = benchmark.bench_statement("9999 in data", namespace, duration=0.1)
+    in_set = benchmark.bench_statement("9999 in lookup", namespace, duration=0.1)
+
+    for result in (in_list, in_set):
+        assert len(result.times) >= benchmark.MIN_RUNS
+        assert result.min <= result.median <= result.p95 <= result.p99
+        # a run lasts about RUN_TARGET
+        assert result.min * result.loops >= benchmark.RUN_TARGET / 10
+    assert in_set.loops > in_list.loops
+    assert in_set.median < in_list.median
+
+
+def test_bench_statement_allocations():
+    namespace = {"data": list(range(10_000))}
+    copy = benchmark.bench_statement("data.copy()", namespace, duration=0.05)
+    assert copy.peak_memory is not None
+    assert copy.peak_memory >= 80_000
+    # the copies are freed, unlike the objects kept by a leak
+    assert abs(copy.retained_blocks) < 0.5
+    leak = benchmark.bench_statement("kept.append([])", {"kept": []}, duration=0.05)
+    assert leak.retained_blocks >= 0.9
+
+
+def test_bench_statement_errors():
+    with pytest.raises(SyntaxError):
+        benchmark.bench_statement("data[0", {})
+    with pytest.raises(NameError):
+        benchmark.bench_statement("undefined", {})
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+
+from prompt_toolkit.completion import CompleteEvent, Completer, Completion
+from prompt_toolkit.document import Document
+
+from plan_d._internal.completion import CompletionIndex, FrameCompleter
+
+
+class SlowCompleter(Completer):
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    def get_completions(self, document, complete_event):
+        self.calls += 1
+        time.sleep(self.delay)
+        yield Completion("from_ipython", start_position=0)
+
+
+class ExpensiveDir:
+    dir_calls = 0
+
+    def __dir__(self):
+        type(self).dir_calls += 1
+        return ["alpha", "beta", "_hidden"]
+
+
+def complete(completer: FrameCompleter, text: str) -> list[str]:
+    completions = completer.get_completions(Document(text), CompleteEvent())
+    return [completion.text for completion in completions]
+
+
+def test_completion_index():
+    frame = sys._getframe()
+    namespace = {"value_one": 1, "value_two": 2, "obj": ExpensiveDir()}
+    index = CompletionIndex(frame, namespace, commands=["vars", "varstree"])
+
+    assert index.complete("value_") == ("value_", ["value_one", "value_two"])
+    assert index.complete("va", first_word=True)[1] == [
+        "value_one",
+        "value_two",
+        "vars",
+        "varstree",
+    ]
+    assert index.complete("p value_", first_word=True)[1] == ["value_one", "value_two"]
+    assert index.complete("obj.")[1] == ["alpha", "beta"]
+    assert index.complete("obj._")[1] == ["_hidden"]
+    assert index.complete("missing.")[1] == []
+
+    # dir() is computed once per object and frame
+    index.complete("obj.a")
+    assert ExpensiveDir.dir_calls == 1
+
+    assert not index.is_stale(frame, namespace)
+    namespace["value_three"] = 3
+    assert index.is_stale(frame, namespace)
+
+
+def test_completion_time_budget():
+    frame = sys._getframe()
+    namespace = {"value_one": 1}
+    slow = SlowCompleter(delay=0.5)
+    completer = FrameCompleter(slow, lambda: (frame, namespace), timeout=0.05)
+
+    started = time.perf_counter()
+    assert complete(completer, "value") == ["value_one"]
+    assert time.perf_counter() - started < 0.4
+
+    # the frame is known to be slow, IPython is not asked again
+    assert complete(completer, "value_") == ["value_one"]
+    assert slow.calls == 1
+
+    # a new frame gets a new index, and another chance
+    def in_new_frame():
+        nonlocal frame
+        frame = sys._getframe()
+        slow.delay = 0
+        completer.pending.result()
+        assert complete(completer, "value") == ["from_ipython"]
+
+    thread = threading.Thread(target=in_new_frame)
+    thread.start()
+    thread.join()
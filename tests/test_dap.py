@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import json
+import socket
+
+import plan_d
+
+from plan_d._internal.dap import DEFAULT_PAGE_SIZE
+
+
+class DapClient:
+    """
+    A minimal scripted DAP client.
+    """
+
+    def __init__(self, port: int) -> None:
+        self.sock = socket.create_connection(("127.0.0.1", port), timeout=10)
+        self.reader = self.sock.makefile("rb")
+        self.seq = 0
+        self.events: list[dict] = []
+
+    def close(self) -> None:
+        self.reader.close()
+        self.sock.close()
+
+    def receive(self) -> dict:
+        length = 0
+        while line := self.reader.readline().strip():
+            name, _, value = line.partition(b": ")
+            if name == b"Content-Length":
+                length = int(value)
+        return json.loads(self.reader.read(length))
+
+    def request(self, command: str, **arguments) -> dict:
+        self.seq += 1
+        body = json.dumps(
+            {
+                "seq": self.seq,
+                "type": "request",
+                "command": command,
+                "arguments": arguments,
+            }
+        ).encode()
+        self.sock.sendall(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        while True:
+            message = self.receive()
+            if message["type"] == "event":
+                self.events.append(message)
+            elif message["request_seq"] == self.seq:
+                return message
+
+    def wait_for_event(self, event: str) -> dict:
+        while True:
+            for index, message in enumerate(self.events):
+                if message["event"] == event:
+                    return self.events.pop(index)
+            self.events.append(self.receive())
+
+
+def paused_function(hello_message):
+    numbers = list(range(1000))
+    config = {"name": "plan-d", "nested": {"depth": 2}}
+    plan_d.set_trace(ip="127.0.0.1", port=0, hello_message=hello_message)
+    for number in numbers[:5]:
+        config["last"] = number  # breakpoint line
+    return config
+
+
+BREAKPOINT_LINE = paused_function.__code__.co_firstlineno + 5
+
+
+def test_dap_session(launcher):
+    port = launcher.debuggee(paused_function)
+    client = DapClient(port)
+    try:
+        response = client.request("initialize", adapterID="plan-d")
+        assert response["success"]
+        assert response["body"]["supportsConfigurationDoneRequest"]
+        client.wait_for_event("initialized")
+
+        assert client.request("attach")["success"]
+        response = client.request(
+            "setBreakpoints",
+            source={"path": __file__},
+            breakpoints=[{"line": BREAKPOINT_LINE, "condition": "number == 2"}],
+        )
+        assert response["body"]["breakpoints"][0]["verified"]
+        assert client.request("configurationDone")["success"]
+
+        stopped = client.wait_for_event("stopped")
+        thread_id = stopped["body"]["threadId"]
+        threads = client.request("threads")["body"]["threads"]
+        assert [item["id"] for item in threads] == [thread_id]
+
+        response = client.request("continue", threadId=thread_id)
+        assert response["success"]
+        stopped = client.wait_for_event("stopped")
+        assert stopped["body"]["reason"] == "breakpoint"
+
+        frames = client.request("stackTrace", threadId=thread_id, levels=1)["body"]
+        top = frames["stackFrames"][0]
+        assert len(frames["stackFrames"]) == 1
+        assert top["name"] == "paused_function"
+        assert top["line"] == BREAKPOINT_LINE
+
+        scopes = client.request("scopes", frameId=top["id"])["body"]["scopes"]
+        local_scope = scopes[0]
+        variables = client.request(
+            "variables", variablesReference=local_scope["variablesReference"]
+        )["body"]["variables"]
+        by_name = {variable["name"]: variable for variable in variables}
+        assert by_name["number"]["value"] == "2"
+
+        # containers are expanded lazily and paged
+        numbers = by_name["numbers"]
+        assert numbers["indexedVariables"] == 1000
+        page = client.request(
+            "variables",
+            variablesReference=numbers["variablesReference"],
+            start=500,
+            count=3,
+        )["body"]["variables"]
+        assert [(item["name"], item["value"]) for item in page] == [
+            ("500", "500"),
+            ("501", "501"),
+            ("502", "502"),
+        ]
+        # without a page, the children are capped
+        first_page = client.request(
+            "variables", variablesReference=numbers["variablesReference"]
+        )["body"]["variables"]
+        assert len(first_page) == DEFAULT_PAGE_SIZE + 1
+        assert first_page[-1]["name"] == "..."
+        assert by_name["config"]["indexedVariables"] == 3
+        nested = client.request(
+            "variables", variablesReference=by_name["config"]["variablesReference"]
+        )["body"]["variables"]
+        assert [item["name"] for item in nested] == ["'name'", "'nested'", "'last'"]
+
+        response = client.request(
+            "evaluate", expression="number * 10", frameId=top["id"]
+        )
+        assert response["body"]["result"] == "20"
+        response = client.request("evaluate", expression="nope", frameId=top["id"])
+        assert not response["success"]
+        assert "NameError" in response["message"]
+
+        assert client.request("disconnect")["success"]
+    finally:
+        client.close()
+    launcher.join()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+import plan_d
+
+from plan_d._internal.evaluation import (
+    EvaluationGuard,
+    EvaluationInterrupted,
+    EvaluationTimeout,
+)
+
+
+def spin(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+def test_timeout():
+    started = time.monotonic()
+    with pytest.raises(EvaluationTimeout), EvaluationGuard(timeout=0.1):
+        spin(10)
+    assert time.monotonic() - started < 5
+
+
+def test_interrupt():
+    guard = EvaluationGuard(timeout=None)
+    threading.Timer(0.1, guard.interrupt).start()
+    with pytest.raises(EvaluationInterrupted) as exc_info, guard:
+        try:
+            spin(10)
+        except Exception:
+            pytest.fail("caught by `except Exception`")
+    assert type(exc_info.value) is EvaluationInterrupted
+    assert not guard.interrupt()
+
+
+def test_extend():
+    started = time.monotonic()
+    with pytest.raises(EvaluationTimeout), EvaluationGuard(timeout=0.1) as guard:
+        guard.extend(0.3)
+        spin(10)
+    assert 0.4 <= time.monotonic() - started < 5
+
+
+def test_suspended():
+    with EvaluationGuard(timeout=0.2) as guard:
+        with guard.suspended():
+            time.sleep(0.3)
+        assert guard.timer is not None
+    assert guard.timer is None
+    # nothing is raised after the guarded code
+    spin(0.1)
+
+
+class Service:
+    def __init__(self) -> None:
+        self.cache = {index: str(index) for index in range(100_000)}
+
+    def __repr__(self) -> str:
+        return "<Service>"
+
+
+class Verbose:
+    def __repr__(self) -> str:
+        return "x" * 2_000_000
+
+
+def debuggee_with_results(hello_message) -> None:
+    svc = Service()
+    # over the budget by itself, however long measuring it takes
+    big = list(range(200_000))
+    verbose = Verbose()
+    plan_d.set_trace(
+        ip="127.0.0.1",
+        port=0,
+        hello_message=hello_message,
+        result_budget=1_000_000,
+    )
+    del svc, big, verbose
+
+
+COMMANDS = ["p svc", "svc", "p big", "p verbose", "limits timeout 0.5", "top 1"]
+
+
+def test_result_bounds(launcher):
+    hello_message, output = launcher.run_commands(COMMANDS)
+    debuggee_with_results(hello_message)
+    launcher.join()
+    lines = output.getvalue().decode().replace("\r\n", "\n").splitlines()
+
+    # the objects are rendered by their repr, whatever they reference
+    assert lines[lines.index("plan-d> p svc") + 1] == "<Service>"
+    assert lines[lines.index("plan-d> svc") + 1] == "<Service>"
+    assert "over the 1.0 MB budget" in lines[lines.index("plan-d> p big") + 1]
+    assert "renders to 2,000,000 characters" in "".join(
+        lines[lines.index("plan-d> p verbose") + 1 :]
+    )
+    # the timeout is extended by the duration of the sampling
+    top_output = lines[lines.index("plan-d> top 1") + 1 :]
+    assert top_output[0] == "Sampling the other threads for 1s..."
+    assert not any("timeout" in line for line in top_output)
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import sys
+import time
+
+import pytest
+
+from plan_d._internal import memory
+
+
+def test_deep_sizeof():
+    numbers = [[index] * 10 for index in range(100)]
+    deep_size = memory.deep_sizeof(numbers)
+    assert deep_size.complete
+    # the outer list, the inner lists and the distinct ints
+    assert deep_size.objects == 1 + 100 + 100
+    assert deep_size.size > sys.getsizeof(numbers) + 100 * sys.getsizeof(numbers[0])
+
+    # classes and modules are shared, they are not counted
+    class Holder:
+        module = sys
+
+    assert memory.deep_sizeof(Holder()).objects <= 2
+
+
+def test_deep_sizeof_bounds():
+    nested = [list(range(1000)) for _ in range(100)]
+    deep_size = memory.deep_sizeof(nested, max_objects=50)
+    assert not deep_size.complete
+    assert deep_size.objects == 50
+
+    # past the deadline, the object is measured shallowly
+    deep_size = memory.deep_sizeof(nested, deadline=time.monotonic() - 1)
+    assert not deep_size.complete
+    assert deep_size.objects == 1
+    assert deep_size.size == sys.getsizeof(nested)
+
+
+def test_deep_sizes_order():
+    sizes = memory.deep_sizes({"small": [1], "large": list(range(1000))})
+    assert [name for name, _, _ in sizes] == ["large", "small"]
+
+
+def test_allocations_diff():
+    assert memory.start_tracing()
+    try:
+        old = memory.take_snapshot()
+        blocks = [bytearray(1024) for _ in range(100)]
+        new = memory.take_snapshot()
+
+        top = memory.diff_allocations(old, new, limit=1)[0]
+        assert memory.format_location(top.traceback) == (
+            f"{__file__}:{test_allocations_diff.__code__.co_firstlineno + 4}"
+        )
+        assert top.size_diff >= 100 * 1024
+        assert memory.top_allocations(new, limit=1)[0].size >= 100 * 1024
+        del blocks
+    finally:
+        memory.stop_tracing()
+
+
+def test_snapshots_are_bounded():
+    assert memory.start_tracing()
+    try:
+        numbers = [memory.add_snapshot() for _ in range(memory.MAX_SNAPSHOTS)]
+        assert numbers == list(range(1, memory.MAX_SNAPSHOTS + 1))
+        with pytest.raises(RuntimeError, match="mem stop"):
+            memory.add_snapshot()
+    finally:
+        memory.stop_tracing()
+    assert not memory.snapshots
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import re
+
+from io import StringIO
+
+from rich.console import Console
+
+from plan_d._internal.pager import Pager
+
+
+HEIGHT = 5
+# the last line of the screen is kept for the prompt
+PAGE_SIZE = HEIGHT - 1
+
+
+def make_console() -> Console:
+    return Console(file=StringIO(), height=HEIGHT, width=40, color_system=None)
+
+
+def scripted_keys(*keys: str):
+    pressed = []
+    remaining = list(keys)
+
+    def read_key() -> str:
+        key = remaining.pop(0)
+        pressed.append(key)
+        return key
+
+    return read_key, pressed
+
+
+class LazyLines:
+    """
+    A renderable yielding its lines one by one, counting the rendered ones.
+    """
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.rendered = 0
+
+    def __rich_console__(self, console, options):
+        for index in range(self.count):
+            self.rendered += 1
+            yield f"line {index}"
+
+
+def output_lines(console: Console) -> list[str]:
+    # the prompt is erased, the next line is printed after its control codes
+    return re.findall(r"line \d+", console.file.getvalue())
+
+
+def test_short_output():
+    console = make_console()
+    read_key, pressed = scripted_keys()
+    Pager(console, read_key).page(LazyLines(PAGE_SIZE))
+    assert output_lines(console) == [f"line {index}" for index in range(PAGE_SIZE)]
+    assert "--More--" not in console.file.getvalue()
+    assert not pressed
+
+
+def test_page_by_page():
+    console = make_console()
+    renderable = LazyLines(100)
+    keys = [" ", "\n", "q"]
+    # the printed lines and the rendered ones, at each prompt
+    prompts = []
+
+    def read_key() -> str:
+        prompts.append((len(output_lines(console)), renderable.rendered))
+        return keys.pop(0)
+
+    Pager(console, read_key).page(renderable)
+
+    # the first page is printed before waiting for a key, and the lines are only
+    # rendered one line ahead of the screen; a space shows a page, an enter a line
+    assert prompts == [
+        (PAGE_SIZE, PAGE_SIZE + 1),
+        (2 * PAGE_SIZE, 2 * PAGE_SIZE + 1),
+        (2 * PAGE_SIZE + 1, 2 * PAGE_SIZE + 2),
+    ]
+
+
+def test_quit():
+    console = make_console()
+    renderable = LazyLines(1000)
+    read_key, pressed = scripted_keys(" ", "q")
+    Pager(console, read_key).page(renderable)
+    assert pressed == [" ", "q"]
+    assert len(output_lines(console)) == 2 * PAGE_SIZE
+    # the rest of the output isn't rendered
+    assert renderable.rendered == 2 * PAGE_SIZE + 1
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from plan_d._internal import profiling
+
+
+def fibonacci(n: int) -> int:
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+
+def spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        fibonacci(15)
+
+
+def test_profile_statement():
+    f_locals = {"n": 15}
+    stats = profiling.profile_statement("result = fibonacci(n)", globals(), f_locals)
+    assert f_locals["result"] == 610
+
+    hottest = profiling.hottest_functions(stats, limit=1)[0]
+    assert hottest.function.startswith("fibonacci (")
+    assert hottest.calls == "1973/1"
+    # only the functions called by the statement are listed
+    functions = [row.function for row in profiling.hottest_functions(stats)]
+    assert not [name for name in functions if "exec" in name or "<module>" in name]
+    assert not [name for name in functions if "_lsprof" in name]
+
+
+def test_sample_stacks():
+    stop = threading.Event()
+    spinning = threading.Thread(target=spin, args=(stop,), daemon=True)
+    sleeping = threading.Thread(target=time.sleep, args=(10,), daemon=True)
+    spinning.start()
+    sleeping.start()
+    try:
+        samples = profiling.sample_stacks(
+            duration=0.2, interval=0.01, exclude_threads=[sleeping.ident]
+        )
+    finally:
+        stop.set()
+        spinning.join()
+
+    assert samples.count > 0
+    names = []
+    node = samples
+    while node.children:
+        node = node.sorted_children()[0]
+        names.append(node.name.split()[0])
+    assert "spin" in names
+    assert "sleep" not in names
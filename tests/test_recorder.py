@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import io
+import subprocess
+import sys
+import textwrap
+import time
+
+from pathlib import Path
+
+import pytest
+
+import plan_d
+
+from plan_d._internal.recorder import (
+    CALL,
+    LINE,
+    MAX_DELTA_VARIABLES,
+    MAX_VALUE_REPR,
+    Recorder,
+)
+
+
+def square(value: int) -> int:
+    result = value * value
+    return result
+
+
+def workload(count: int) -> int:
+    total = 0
+    for index in range(count):
+        total += square(index)
+    return total
+
+
+def run_recorded(count: int, capacity: int) -> Recorder:
+    recorder = Recorder(sys._getframe(), capacity)
+
+    def trace(frame, event, arg):
+        recorder.record(frame, event)
+        return trace if recorder.active and recorder.is_recorded(frame) else None
+
+    sys.settrace(trace)
+    try:
+        workload(count)
+    finally:
+        sys.settrace(None)
+    return recorder
+
+
+def test_recorder_events():
+    recorder = run_recorded(3, capacity=1000)
+    assert recorder.count == len(recorder)
+    first = recorder.event(0)
+    assert (first.kind, first.code, first.depth) == (CALL, workload.__code__, 1)
+    assert first.delta == (("count", "3"),)
+
+    # `return total`, the last `for` and the last line of `square`, called with 2
+    event = recorder.previous_line(recorder.count)
+    event = recorder.previous_line(event.number)
+    assert event.code is workload.__code__
+    event = recorder.previous_line(event.number)
+    assert (event.code, event.depth) == (square.__code__, 2)
+    assert recorder.locals_at(event.number) == ({"value": "2", "result": "4"}, True)
+
+    # over the calls
+    event = recorder.previous_line(event.number, max_depth=1)
+    assert event.code is workload.__code__
+    assert recorder.locals_at(event.number)[0] == {
+        "count": "3",
+        "total": "1",
+        "index": "2",
+    }
+    assert recorder.next_line(event.number, max_depth=1).kind == LINE
+
+
+def test_recorder_memory_is_bounded():
+    capacity = 100
+    recorder = run_recorded(1000, capacity)
+    assert recorder.count > 10 * capacity
+    assert len(recorder) == capacity
+    assert len(recorder.deltas) == capacity
+    assert all(len(array) == capacity for array in (recorder.linenos, recorder.kinds))
+    assert len(recorder.codes) == 2
+    # only the frame the recording started from is left
+    assert len(recorder.frames) == 1
+    assert all(len(delta) <= MAX_DELTA_VARIABLES for delta in recorder.deltas)
+
+    # the call of `workload` is no longer in the buffer
+    last_line = recorder.previous_line(recorder.count)
+    assert last_line.code is workload.__code__
+    assert not recorder.locals_at(last_line.number)[1]
+
+
+def test_recorder_overhead():
+    """
+    A benchmark of the cost of recording a line, reported with `pytest -s`.
+    """
+    count = 20_000
+    started = time.perf_counter()
+    workload(count)
+    plain = time.perf_counter() - started
+
+    started = time.perf_counter()
+    recorder = run_recorded(count, capacity=10_000)
+    recorded = time.perf_counter() - started
+
+    overhead = (recorded - plain) / recorder.count
+    print(f"recording overhead: {overhead * 1e6:.2f}us per event")
+    assert overhead < 50e-6
+
+
+def test_recorded_reprs_are_bounded():
+    recorder = Recorder(sys._getframe())
+    assert len(recorder._repr("x" * 1000)) == MAX_VALUE_REPR
+    assert len(recorder._repr([["x" * 80] * 6] * 6)) == MAX_VALUE_REPR
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError, match="must be positive"):
+        Recorder(sys._getframe(), 0)
+    # rejected before waiting for a client
+    with pytest.raises(ValueError, match="must be positive"):
+        plan_d.set_trace(record=-1)
+
+
+RECORDED_PROGRAM = textwrap.dedent(
+    """
+    import sys
+
+    import plan_d
+
+    from plan_d._internal.recorder import Recorder
+
+    def square(value):
+        return value * value
+
+    def recorded_region():
+        plan_d.set_trace(
+            ip="127.0.0.1",
+            port=0,
+            hello_message=lambda ip, port: print(port, flush=True) or "",
+            record=True,
+        )
+        return sum(square(index) for index in range(3))
+
+    if sys.argv[1:] == ["broken"]:
+        def record(self, frame, event):
+            raise RuntimeError("broken recorder")
+
+        Recorder.record = record
+
+    print(recorded_region(), sys.gettrace() is None)
+    """
+)
+
+
+@pytest.mark.parametrize("broken", [False, True])
+def test_recording_stops_tracing(broken: bool):
+    process = subprocess.Popen(
+        [sys.executable, "-c", RECORDED_PROGRAM, *(["broken"] if broken else [])],
+        cwd=Path(plan_d.__file__).parent.parent,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    output = io.BytesIO()
+    try:
+        port = int(process.stdout.readline())  # type: ignore[union-attr]
+        # the session is kept after `c`, it ends with the program, the queued
+        # `detach` is never run
+        plan_d.run_debugger_commands(
+            "127.0.0.1",
+            port,
+            ["record 0", "record -1", "record many", "c", "detach"],
+            timeout=10,
+            output=output,
+        )
+        # without breakpoints, the program runs untraced once the recording is over,
+        # whether the recorded frame returned or the recorder failed
+        assert process.stdout.read() == "5 True\n"  # type: ignore[union-attr]
+        assert process.wait(timeout=10) == 0
+    finally:
+        process.kill()
+        process.wait()
+
+    text = output.getvalue().decode()
+    assert text.count("Usage: record") == 3
+    assert ("Recording stopped, RuntimeError: broken recorder" in text) == broken
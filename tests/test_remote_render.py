@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import io
+import json
+import linecache
+import os
+import sys
+
+from rich import box
+from rich.console import Console, Group
+from rich.panel import Panel
+from rich.syntax import Syntax
+from rich.table import Table
+from rich.text import Text
+from rich.traceback import Traceback
+from rich.tree import Tree
+
+from plan_d._internal.remote_render import (
+    APC_END,
+    APC_START,
+    ClientPiping,
+    MessageStreamDecoder,
+    _linecache_sources,
+    decode_message,
+    dump_message,
+    encode_message,
+    load_renderable,
+)
+
+
+def render(*objects) -> str:
+    console = Console(file=io.StringIO(), width=80, color_system=None)
+    with _linecache_sources(list(objects)):
+        console.print(*objects)
+    return console.file.getvalue()  # type: ignore[attr-defined]
+
+
+def round_trip(obj):
+    message = dump_message((obj,), {})
+    assert message is not None
+    # the message must survive the wire format
+    message = json.loads(json.dumps(message))
+    return load_renderable(message["objects"][0])
+
+
+def test_round_trip_table():
+    table = Table(title="List of local variables", box=box.MINIMAL)
+    table.add_column("Variable", style="cyan")
+    table.add_column("Value", style="magenta")
+    table.add_row("a", "1")
+    table.add_row(Text("b", style="bold"), "[1, 2]")
+    assert render(round_trip(table)) == render(table)
+
+
+def test_round_trip_tree_and_panel():
+    tree = Tree("Variables")
+    tree.add("<class 'int'>", style="bold green").add("a: 1", style="magenta")
+    panel = Panel(Group("x", tree), title="vars", box=box.SIMPLE)
+    assert render(round_trip(panel)) == render(panel)
+
+    panel = Panel("padded", padding=1)
+    assert render(round_trip(panel)) == render(panel)
+
+
+def test_round_trip_syntax_only_sends_line_range():
+    syntax = Syntax.from_path(
+        __file__,
+        line_numbers=True,
+        theme="ansi_dark",
+        line_range=(3, 6),
+        highlight_lines={4},
+    )
+    message = dump_message((syntax,), {})
+    assert message is not None
+    code = message["objects"][0]["code"]
+    assert "import io" in code
+    assert "def render" not in code
+    assert render(round_trip(syntax)) == render(syntax)
+
+
+def test_round_trip_traceback():
+    try:
+        1 / 0  # noqa: B018
+    except ZeroDivisionError:
+        traceback = Traceback()
+    loaded = round_trip(traceback)
+    assert "1 / 0" in render(loaded)
+    assert render(loaded) == render(traceback)
+
+
+def test_round_trip_nested_traceback():
+    # a file only the server can read
+    filename = "/remote/app.py"
+    source = "def fail():\n    return 1 / 0\n"
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace: dict = {}
+    exec(compile(source, filename, "exec"), namespace)
+    try:
+        namespace["fail"]()
+    except ZeroDivisionError:
+        group = Group(Text("Thread 1"), Traceback())
+    message = json.loads(json.dumps(dump_message((group,), {})))
+    del linecache.cache[filename]
+
+    loaded = load_renderable(message["objects"][0])
+    assert "return 1 / 0" in render(loaded)
+    assert filename not in linecache.cache
+
+
+def test_unsupported_renderable_falls_back():
+    assert dump_message((object(),), {}) is None
+    assert dump_message(("text",), {"file": sys.stdout}) is None
+
+
+def test_decoder_handles_split_messages():
+    message = {"objects": ["hello"], "kwargs": {}, "pager": False}
+    stream = b"before" + encode_message(message).encode() + b"after\x1b[0m"
+    for chunk_size in (1, 3, 7, len(stream)):
+        decoder = MessageStreamDecoder()
+        parts: list = []
+        for index in range(0, len(stream), chunk_size):
+            parts.extend(decoder.feed(stream[index : index + chunk_size]))
+        raw = b"".join(part for part in parts if isinstance(part, bytes))
+        messages = [part for part in parts if isinstance(part, dict)]
+        assert raw == b"beforeafter\x1b[0m"
+        assert messages == [message]
+
+
+def test_encode_decode():
+    message = {"objects": [None, "a"], "kwargs": {"end": ""}, "pager": True}
+    encoded = encode_message(message).encode()
+    assert decode_message(encoded[len(b"\x1b_plan-d;") : -2]) == message
+
+
+def test_decoder_skips_corrupted_messages():
+    decoder = MessageStreamDecoder()
+    parts = list(decoder.feed(APC_START + b"garbage" + APC_END + b"after"))
+    assert len(parts) == 2
+    assert "couldn't be rendered" in parts[0]["objects"][0]
+    assert parts[1] == b"after"
+
+
+def test_client_piping_survives_unloadable_messages():
+    server_read, server_write = os.pipe()
+    out_read, out_write = os.pipe()
+    piping = ClientPiping({server_read: {out_write}}, server_read, in_fd=-1)
+    unknown = {"objects": [{"type": "unknown"}], "kwargs": {}, "pager": False}
+    os.write(server_write, f"before{encode_message(unknown)}after".encode())
+    piping._read(server_read, {out_write})
+    piping._flush(out_write)
+    output = os.read(out_read, 4096)
+    assert output.startswith(b"before")
+    assert b"couldn't be rendered" in output
+    assert output.endswith(b"after")
+    piping.loop.close()
+    for fd in (server_read, server_write, out_read, out_write):
+        os.close(fd)
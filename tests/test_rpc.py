@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import queue
+import socket
+
+import pytest
+
+from madbg.communication import send_message
+
+import plan_d
+
+
+def paused_function(hello_message):
+    items = list(range(10))
+    total = 0
+    plan_d.set_trace(ip="127.0.0.1", port=0, hello_message=hello_message)
+    for item in items:
+        total += item  # breakpoint line
+    return total
+
+
+BREAKPOINT_LINE = paused_function.__code__.co_firstlineno + 5
+
+
+def test_rpc_session(launcher):
+    port = launcher.debuggee(paused_function)
+    with plan_d.RpcClient.connect("127.0.0.1", port) as client:
+        stopped = client.wait_for_stop()
+        assert stopped["reason"] == "step"
+        assert stopped["frame"]["name"] == "paused_function"
+
+        stack = client.stack()
+        assert stack["frames"][stack["current"]]["name"] == "paused_function"
+
+        local_vars = client.locals(max_items=1, max_repr=10)
+        assert local_vars["truncated"]
+        assert len(local_vars["variables"]) == 1
+        assert len(local_vars["variables"][0]["repr"]) <= 10
+
+        assert client.evaluate("sum(items)") == {"type": "int", "repr": "45"}
+        with pytest.raises(plan_d.RpcError, match="ZeroDivisionError"):
+            client.evaluate("1 / 0")
+
+        number = client.set_breakpoint(__file__, BREAKPOINT_LINE, condition="item == 3")
+        assert [bp["number"] for bp in client.breakpoints()] == [number]
+        client.cont()
+
+        stopped = client.wait_for_stop()
+        assert stopped["reason"] == "breakpoint"
+        assert stopped["frame"]["lineno"] == BREAKPOINT_LINE
+        assert client.evaluate("item")["repr"] == "3"
+
+        client.clear_breakpoint(number)
+        client.detach()
+    launcher.join()
+
+
+def test_rpc_unknown_method(launcher):
+    port = launcher.debuggee(paused_function)
+    with plan_d.RpcClient.connect("127.0.0.1", port) as client:
+        client.wait_for_stop()
+        with pytest.raises(plan_d.RpcError, match="not found"):
+            client.call("nope")
+        client.detach()
+    launcher.join()
+
+
+def test_unknown_handshake(launcher):
+    errors: queue.Queue[BaseException] = queue.Queue()
+
+    def rejecting_function(hello_message):
+        try:
+            paused_function(hello_message)
+        except ValueError as e:
+            errors.put(e)
+
+    port = launcher.debuggee(rejecting_function)
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        send_message(sock, {"mode": "unknown"})
+        # rejected, not answered in another protocol
+        assert sock.recv(1024) == b""
+    launcher.join()
+    assert "Unknown debugger client handshake" in str(errors.get_nowait())
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import plan_d
+
+
+COMMANDS = ["# a comment", "p sum(items) * 10", "", "p len(items)", "c"]
+
+
+def paused_function(hello_message):
+    items = [3, 4, 5]
+    plan_d.set_trace(ip="127.0.0.1", port=0, hello_message=hello_message)
+    return sum(items)
+
+
+def test_run_debugger_commands(launcher):
+    hello_message, output = launcher.run_commands(COMMANDS)
+    # the program goes on after the session
+    assert paused_function(hello_message) == 12
+    launcher.join()
+
+    lines = output.getvalue().decode().replace("\r\n", "\n").splitlines()
+    # the commands are echoed, and a trailing `c` detaches the session
+    echoed = [line for line in lines if line.startswith("plan-d> ")]
+    assert echoed == [
+        "plan-d> p sum(items) * 10",
+        "plan-d> p len(items)",
+        "plan-d> detach",
+    ]
+    assert lines[lines.index("plan-d> p sum(items) * 10") + 1] == "120"
+    assert lines[lines.index("plan-d> p len(items)") + 1] == "3"
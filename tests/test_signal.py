@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import plan_d
+
+
+def client_session(port: int, results: queue.Queue) -> None:
+    with plan_d.RpcClient.connect("127.0.0.1", port) as client:
+        stopped = client.wait_for_stop()
+        results.put(stopped["frame"]["name"])
+        results.put(client.evaluate("marker")["repr"])
+        client.detach()
+
+
+def interrupted_function() -> str:
+    marker = "paused here"
+    os.kill(os.getpid(), signal.SIGUSR2)
+    return marker
+
+
+def test_signal_handler(launcher):
+    results: queue.Queue = queue.Queue()
+    old_handler = signal.getsignal(signal.SIGUSR2)
+    plan_d.install_signal_handler(
+        ip="127.0.0.1",
+        port=0,
+        hello_message=launcher.hello_message(
+            lambda port: client_session(port, results)
+        ),
+    )
+    try:
+        assert interrupted_function() == "paused here"
+    finally:
+        signal.signal(signal.SIGUSR2, old_handler)
+    launcher.join()
+    assert results.get_nowait() == "interrupted_function"
+    assert results.get_nowait() == "'paused here'"
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="requires Python 3.12+")
+def test_signal_handler_named_thread(launcher):
+    results: queue.Queue = queue.Queue()
+    running = [True]
+
+    def worker() -> None:
+        marker = "worker"
+        while running[0]:
+            pass
+        del marker
+
+    thread = threading.Thread(target=worker, name="worker", daemon=True)
+    thread.start()
+    old_handler = signal.getsignal(signal.SIGUSR2)
+    plan_d.install_signal_handler(
+        ip="127.0.0.1",
+        port=0,
+        thread="worker",
+        hello_message=launcher.hello_message(
+            lambda port: client_session(port, results)
+        ),
+    )
+    try:
+        os.kill(os.getpid(), signal.SIGUSR2)
+        # the session runs in the worker, the client is started from there
+        assert results.get(timeout=10) == "worker"
+        assert results.get(timeout=10) == "'worker'"
+        launcher.join()
+    finally:
+        signal.signal(signal.SIGUSR2, old_handler)
+        running[0] = False
+    thread.join(timeout=10)
+
+
+def test_signal_handler_requires_python_312_for_threads():
+    if sys.version_info >= (3, 12):
+        pytest.skip("named threads are supported")
+    with pytest.raises(RuntimeError, match=r"3\.12"):
+        plan_d.install_signal_handler(thread="worker")
+
+
+@pytest.mark.parametrize(
+    ("env", "reason"),
+    [
+        ({"PLAND_SIGNAL": "USR9"}, "'USR9' is not a signal"),
+        ({"PLAND_SIGNAL": "999"}, "'999' is not a signal"),
+        ({"PLAND_SIGNAL": "KILL"}, "SIGKILL can't be handled"),
+        pytest.param(
+            {"PLAND_SIGNAL": "USR2", "PLAND_SIGNAL_THREAD": "worker"},
+            "Pausing a named thread requires Python 3.12+",
+            marks=pytest.mark.skipif(
+                sys.version_info >= (3, 12), reason="named threads are supported"
+            ),
+        ),
+    ],
+)
+def test_signal_env_errors_dont_break_the_import(env: dict[str, str], reason: str):
+    process = subprocess.run(
+        [sys.executable, "-c", "import plan_d"],
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert process.returncode == 0, process.stderr
+    assert process.stderr == f"plan-d: PLAND_SIGNAL is ignored: {reason}\n"
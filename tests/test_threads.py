@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import threading
+
+from plan_d._internal import threads
+
+
+def wait_for(event: threading.Event) -> None:
+    event.wait()
+
+
+def test_group_thread_stacks():
+    event = threading.Event()
+    workers = [
+        threading.Thread(target=wait_for, args=(event,), name=f"worker-{index}")
+        for index in range(3)
+    ]
+    other = threading.Thread(target=event.wait, name="other")
+    for thread in [*workers, other]:
+        thread.start()
+    try:
+        groups = threads.group_thread_stacks(exclude_threads=[other.ident])
+    finally:
+        event.set()
+        for thread in [*workers, other]:
+            thread.join()
+
+    group = groups[0]
+    assert group.names == ["worker-0", "worker-1", "worker-2"]
+    assert [frame.f_code.co_name for frame, _ in group.stack][-3:] == [
+        "wait_for",
+        "wait",
+        "wait",
+    ]
+    assert all("other" not in group.names for group in groups)
+    assert all(threading.current_thread().name not in group.names for group in groups)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import sys
+import time
+
+from plan_d._internal.watch import UNAVAILABLE, Watchpoint
+
+
+class SlowEquality:
+    def __eq__(self, other):
+        time.sleep(0.01)
+        return True
+
+    __hash__ = object.__hash__
+
+
+def test_watchpoint_changes():
+    items = [1]
+    total = 1
+    frame = sys._getframe()
+    items_watch = Watchpoint(1, "items", frame)
+    total_watch = Watchpoint(2, "total", frame)
+
+    assert items_watch.update(frame) is None
+    # mutations of small containers are detected
+    items.append(2)
+    assert items_watch.update(frame) == ([1], [1, 2])
+    assert items_watch.update(frame) is None
+
+    # equal values are not changes
+    total = int("1")
+    assert total_watch.update(frame) is None
+    total += 1
+    assert total_watch.update(frame) == (1, 2)
+
+
+def test_watchpoint_unavailable():
+    frame = sys._getframe()
+    watchpoint = Watchpoint(1, "later", frame)
+    assert watchpoint.value is UNAVAILABLE
+    later = 1
+    assert watchpoint.update(frame) is None
+    later = 2
+    assert watchpoint.update(frame) == (1, later)
+
+
+def test_watchpoint_compare_budget():
+    value = SlowEquality()
+    frame = sys._getframe()
+    watchpoint = Watchpoint(1, "value", frame)
+    value = SlowEquality()
+    assert watchpoint.update(frame) is None
+    assert watchpoint.identity_only
+    value = SlowEquality()
+    assert watchpoint.update(frame) is not None
+    del value